@@ -10,6 +10,7 @@ import time
 import subprocess
 import platform
 from typing import List, Dict, Any
+from capture import get_capture_backend
 
 
 class ComputerActions:
@@ -599,7 +600,7 @@ class ComputerActions:
         Example:
             screenshot('output.png')
         """
-        img = pyautogui.screenshot()
+        img = get_capture_backend().grab()
         
         if filename:
             img.save(filename)
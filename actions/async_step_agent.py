@@ -0,0 +1,313 @@
+"""
+async_step_agent.py - StepAgent on asyncio
+
+Same prompts, parsing and handoff format as StepAgent, but the model call
+goes through AsyncAnthropic and blocking work (capture, encoding, pyautogui
+actions) runs in worker threads, so the event loop is free while a step
+waits on the network or on the screen. That lets one process drive many
+agents: while one agent waits for its screen to settle or for the model,
+the others keep going. A single agent is no faster than StepAgent.
+
+Usage:
+    agent = AsyncStepAgent(anthropic_api_key=key)
+    result = asyncio.run(agent.run("open chrome"))
+
+    # Several agents at once (each with its own desktop / FramePipeline)
+    results = asyncio.run(run_agents([(agent_a, "goal a"), (agent_b, "goal b")]))
+"""
+
+import asyncio
+import json
+import functools
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from anthropic import AsyncAnthropic
+from frames import Frame
+from encoding import EncodeResult, codec_stats
+from json_stream import JSONObjectScanner
+from step_agent import REQUEST_TIMEOUT, StepAgent
+
+
+class AsyncStepAgent(StepAgent):
+    """
+    StepAgent whose run/next_action/execute_action are coroutines.
+    """
+
+    def __init__(
+        self,
+        anthropic_api_key: str,
+        settle_time: float = 0.0,
+        input_lock: Optional[asyncio.Lock] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            anthropic_api_key: Anthropic API key
+            settle_time: Seconds to let the screen settle after an action before
+                the next observation (other agents keep running meanwhile)
+            input_lock: Lock serializing mouse/keyboard input; share one between
+                agents that drive the same desktop
+            **kwargs: Passed to StepAgent (grounding_model, frames, roi, streaming, ...);
+                speculate and trajectories aren't supported here
+        """
+        unsupported = [name for name in ('speculate', 'trajectories') if kwargs.get(name)]
+        if unsupported:
+            raise ValueError(f"AsyncStepAgent doesn't support {', '.join(unsupported)}")
+        super().__init__(anthropic_api_key, **kwargs)
+        self.client = AsyncAnthropic(api_key=anthropic_api_key, base_url=kwargs.get('anthropic_base_url'),
+                                     max_retries=0, timeout=REQUEST_TIMEOUT)
+        self.settle_time = settle_time
+        self._input_lock = input_lock
+
+    @property
+    def input_lock(self) -> asyncio.Lock:
+        # Created lazily so it belongs to the loop the agent runs on
+        if self._input_lock is None:
+            self._input_lock = asyncio.Lock()
+        return self._input_lock
+
+    async def _in_thread(self, func: Callable, *args, **kwargs) -> Any:
+        """Run blocking work on the default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _observe(self) -> Tuple[Frame, EncodeResult]:
+        """Capture and encode a fresh frame."""
+        return await self._in_thread(self._screenshot)
+
+    async def next_action(self, goal: str,
+                          observation: Optional[Tuple[Frame, EncodeResult]] = None) -> Dict[str, Any]:
+        """
+        Decide the next action to take.
+
+        Args:
+            goal: The overall goal to accomplish
+            observation: (frame, encoding) to decide on, e.g. to retry on the same frame
+
+        Returns:
+            Action dictionary with 'action', 'params', 'reasoning'
+        """
+        if self._uses_decision_cache():
+            if observation is None:
+                observation = await self._observe()
+            action_dict = await self._in_thread(self._cached_decision, goal, observation[0])
+            if action_dict is not None:
+                return action_dict
+        messages = await self._in_thread(self._decision_messages, goal, observation)
+
+        print("🤔 Asking Claude for next action...")
+        self._count_decision()
+        frame = self._last_observation[0]
+        tier = self._pick_tier()
+        try:
+            action_dict, response_text = await self._decide(messages, frame, tier)
+            reason = self._escalation_reason(action_dict) if tier == "fast" else None
+        except (json.JSONDecodeError, ValueError):
+            if tier != "fast":
+                raise
+            reason = "parse_failure"
+
+        if reason:
+            print(f"   ⬆️  Escalating to {self.model} ({reason})")
+            self.tier_stats.escalated(reason)
+            action_dict, response_text = await self._decide(messages, frame, "strong")
+
+        self._record_reply(response_text)
+        self._cache_decision(action_dict)
+        return action_dict
+
+    async def _decide(self, messages: List[Dict[str, Any]], frame: Frame, tier: str) -> Tuple[Dict[str, Any], str]:
+        """One decision request on a tier (see StepAgent._decide)."""
+        model = self._tier_model(tier)
+        start = time.perf_counter()
+        try:
+            if self.tools:
+                action_dict = await self._tool_decision(messages, frame, model=model)
+                return action_dict, json.dumps(action_dict)
+            if self.streaming:
+                response_text = await self._stream_decision(messages, model)
+            else:
+                response = await self._create_message(
+                    model=model,
+                    max_tokens=500,
+                    system=self.system_prompt,
+                    messages=messages
+                )
+                self.cache_stats.record(getattr(response, 'usage', None))
+                response_text = response.content[0].text
+            return self._parse_action(response_text, frame=frame), response_text
+        finally:
+            self.tier_stats.record(tier, time.perf_counter() - start)
+
+    async def _tool_decision(self, messages: List[Dict[str, Any]], frame: Frame, repairs: int = 1,
+                             model: Optional[str] = None) -> Dict[str, Any]:
+        """Get the decision as a validated tool call (see StepAgent._tool_decision)."""
+        for attempt in range(repairs + 1):
+            response = await self._create_message(**self._tool_request(messages, model))
+            self.cache_stats.record(getattr(response, 'usage', None))
+            action_dict, messages = self._read_tool_call(response, messages, frame, attempt == repairs)
+            if action_dict is not None:
+                return action_dict
+
+    async def _create_message(self, **request) -> Any:
+        """messages.create, hedged when hedging is on (the losing task is cancelled)."""
+        if self.hedger is None:
+            return await self.breaker.acall(lambda: self.client.messages.create(**request))
+        return await self.breaker.acall(lambda: self.hedger.acall(lambda: self.client.messages.create(**request)))
+
+    async def _stream_decision(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> str:
+        """Stream a step decision and stop reading once the JSON object closes."""
+        start = time.perf_counter()
+
+        async def attempt() -> Tuple[JSONObjectScanner, List[str], Any]:
+            scanner = JSONObjectScanner()
+            chunks = []
+            async with self.client.messages.stream(
+                model=model or self.model,
+                max_tokens=500,
+                system=self.system_prompt,
+                messages=messages
+            ) as stream:
+                async for chunk in stream.text_stream:
+                    chunks.append(chunk)
+                    if scanner.feed(chunk) is not None:
+                        break
+                usage = getattr(stream.current_message_snapshot, 'usage', None)
+            return scanner, chunks, usage
+
+        scanner, chunks, usage = await self.breaker.acall(lambda: self.hedger.acall(attempt) if self.hedger else attempt())
+        # Only the attempt whose answer is used counts, not a hedged loser
+        self.cache_stats.record(usage)
+        if scanner.complete is not None:
+            print(f"   ⚡ Decision complete after {time.perf_counter() - start:.2f}s, stream cancelled")
+            return scanner.complete
+        return "".join(chunks)
+
+    async def execute_action(self, action_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute a single action without blocking the event loop.
+
+        Args:
+            action_dict: Action from next_action()
+
+        Returns:
+            Execution result
+        """
+        if action_dict.get('action') == 'wait':
+            # Sleep on the loop rather than holding a worker thread
+            seconds = float((action_dict.get('params') or {}).get('seconds', 1.0))
+            print(f"\n⚡ Action: wait")
+            print(f"   Why: {action_dict.get('reasoning', '')}")
+            await asyncio.sleep(seconds)
+            self.frames.invalidate()
+            print(f"   ✅ Success")
+            return {
+                "action": "wait",
+                "params": action_dict.get('params', {}),
+                "reasoning": action_dict.get('reasoning', ''),
+                "result": {"status": "success", "action": "wait", "seconds": seconds},
+                "status": "success"
+            }
+
+        async with self.input_lock:
+            return await self._in_thread(super().execute_action, action_dict)
+
+    async def run(self, goal: str, max_steps: int = 20,
+                  history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Run the agent step-by-step until done or handoff needed.
+
+        Args:
+            goal: Goal to accomplish
+            max_steps: Maximum number of steps before stopping
+            history: Steps already taken toward the goal (e.g. by run_intent)
+
+        Returns:
+            Dictionary with status and history (same shape as StepAgent.run)
+        """
+        print("=" * 60)
+        print(f"🎯 GOAL: {goal}")
+        print("=" * 60)
+
+        self.history = list(history or [])
+        # Whatever the last run left cached is stale by now
+        self.frames.invalidate()
+        self.cache_stats.reset()
+        codec_stats.reset()
+        self.tier_stats.reset()
+        self.retry_policy.retries = 0
+        if self.hedger:
+            self.hedger.stats.reset()
+        if self.conversation:
+            self.conversation.reset(goal)
+        self._replied_at = 0
+        self.decisions = 0
+        self.cached_decisions = 0
+        self._decision_key = None
+        handoff_info = None
+        error = None
+        step = 0
+        queued = []  # Rest of the current action batch
+
+        for step in range(1, max_steps + 1):
+            print(f"\n{'='*60}")
+            print(f"STEP {step}/{max_steps}")
+            print(f"{'='*60}")
+
+            # Only a decision made (or looked up) in this step may be forgotten
+            self._decision_key = None
+
+            # Get next action, with backoff between retries
+            action_dict = queued.pop(0) if queued else None
+
+            if action_dict is None:
+                # Set once this step's frame is captured; until then a retry captures afresh
+                self._last_observation = None
+                try:
+                    # A retry re-asks about the same, already encoded frame
+                    action_dict, queued = self._expand_batch(await self.retry_policy.acall(
+                        lambda attempt: self.next_action(goal, None if attempt == 1 else self._last_observation)))
+                except Exception as e:
+                    action_dict, error = self._decision_failed(e)
+                    if action_dict is None:
+                        break
+
+            result = await self.execute_action(action_dict)
+            self.history.append(result)
+
+            stop, handoff_info = self._check_result(result, goal)
+            if stop:
+                break
+            if result['status'] != 'success' and queued:
+                print(f"   ⚠️  Dropping {len(queued)} remaining batched actions")
+                queued = []
+            if queued:
+                # Batched actions run without a new observation
+                continue
+
+            # Let the screen settle before the next observation (a wait action
+            # was the settle time already); other agents run meanwhile
+            if self.settle_time and result['action'] != 'wait':
+                await asyncio.sleep(self.settle_time)
+
+        if step >= max_steps and error is None:
+            print("\n" + "=" * 60)
+            print("⚠️  Reached max steps")
+            print("=" * 60)
+
+        return self._summarize(goal, handoff_info, error)
+
+
+async def run_agents(jobs: List[Tuple[AsyncStepAgent, str]], max_steps: int = 20) -> List[Dict[str, Any]]:
+    """
+    Run several agents concurrently in this process.
+
+    Args:
+        jobs: (agent, goal) pairs; agents on the same desktop should share an input_lock
+        max_steps: Step limit for each agent
+
+    Returns:
+        One run() result per job, in order
+    """
+    return await asyncio.gather(*(agent.run(goal, max_steps=max_steps) for agent, goal in jobs))
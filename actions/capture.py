@@ -0,0 +1,411 @@
+"""
+capture.py - Pluggable screen capture backends
+
+pyautogui.screenshot() on Linux shells out to an external tool and goes
+through a temp file on every call. XShmCapture instead keeps one X
+connection and one shared-memory image segment open for the life of the
+process, so a grab is a single XShmGetImage round trip.
+
+Use get_capture_backend() to get the fastest backend that works here.
+Set CAPTURE_BACKEND=pyautogui|xshm to force one.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import platform
+import re
+import subprocess
+import threading
+from typing import Optional, Tuple
+
+import pyautogui
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for grab_array()
+    np = None
+
+
+class CaptureBackend:
+    """
+    Base class: grab() returns the whole screen as an RGB PIL image.
+    """
+
+    name = "base"
+
+    def grab(self) -> Image.Image:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyAutoGUICapture(CaptureBackend):
+    """
+    Fallback that works everywhere pyautogui does.
+    """
+
+    name = "pyautogui"
+
+    def grab(self) -> Image.Image:
+        return pyautogui.screenshot()
+
+
+# ==================== XSHM (LINUX / X11) ====================
+
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; we never touch the rest
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+def _load_library(name: str):
+    path = ctypes.util.find_library(name)
+    if not path:
+        raise OSError(f"lib{name} not found")
+    return ctypes.CDLL(path)
+
+
+class XShmCapture(CaptureBackend):
+    """
+    X11 MIT-SHM capture: persistent display connection and shm segment.
+
+    grab_array() returns a zero-copy (height, width, 4) BGRX NumPy view of
+    the segment, valid until the next grab. grab() converts that to an RGB
+    PIL image the caller owns.
+    """
+
+    name = "xshm"
+
+    def __init__(self, display_name: Optional[str] = None):
+        if not (display_name or os.environ.get('DISPLAY')):
+            raise RuntimeError("No X display")
+
+        self._lock = threading.Lock()
+        self._x11 = _load_library('X11')
+        self._xext = _load_library('Xext')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._declare_signatures()
+
+        self._display = self._x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self._display:
+            raise RuntimeError("Could not open X display")
+
+        if not self._xext.XShmQueryExtension(self._display):
+            self._abort()
+            raise RuntimeError("X server has no MIT-SHM extension")
+
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XRootWindow(self._display, screen)
+        self.width = self._x11.XDisplayWidth(self._display, screen)
+        self.height = self._x11.XDisplayHeight(self._display, screen)
+
+        self._shminfo = _XShmSegmentInfo()
+        self._image = self._xext.XShmCreateImage(
+            self._display,
+            self._x11.XDefaultVisual(self._display, screen),
+            self._x11.XDefaultDepth(self._display, screen),
+            _ZPIXMAP, None, ctypes.byref(self._shminfo),
+            self.width, self.height
+        )
+        if not self._image:
+            self._image = None
+            self._abort()
+            raise RuntimeError("XShmCreateImage failed")
+
+        ximage = self._image.contents
+        if ximage.bits_per_pixel != 32:
+            self._abort()
+            raise RuntimeError(f"Unsupported pixel format: {ximage.bits_per_pixel} bpp")
+
+        self._stride = ximage.bytes_per_line
+        size = self._stride * self.height
+        self._shminfo.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if self._shminfo.shmid < 0:
+            self._abort()
+            raise OSError(ctypes.get_errno(), "shmget failed")
+
+        self._shminfo.shmaddr = self._libc.shmat(self._shminfo.shmid, None, 0)
+        self._shminfo.readOnly = 0
+        ximage.data = self._shminfo.shmaddr
+
+        self._xext.XShmAttach(self._display, ctypes.byref(self._shminfo))
+        self._x11.XSync(self._display, 0)
+        # Segment goes away on its own once both sides detach
+        self._libc.shmctl(self._shminfo.shmid, _IPC_RMID, None)
+
+        self._buffer = (ctypes.c_char * size).from_address(self._shminfo.shmaddr)
+
+    def _abort(self):
+        """Release what __init__ set up before the segment was attached."""
+        if getattr(self, '_image', None):
+            self._x11.XFree(self._image)
+        self._x11.XCloseDisplay(self._display)
+        self._display = None
+
+    def _declare_signatures(self):
+        x11, xext, libc = self._x11, self._xext, self._libc
+
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        for fn in (x11.XDefaultScreen, x11.XCloseDisplay):
+            fn.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        for fn in (x11.XDefaultDepth, x11.XDisplayWidth, x11.XDisplayHeight):
+            fn.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+            ctypes.c_char_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint
+        ]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+            ctypes.c_int, ctypes.c_int, ctypes.c_ulong
+        ]
+
+        libc.shmget.restype = ctypes.c_int
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def _grab_into_segment(self):
+        if not self._xext.XShmGetImage(self._display, self._root, self._image, 0, 0, _ALL_PLANES):
+            raise RuntimeError("XShmGetImage failed")
+
+    def grab_array(self):
+        """
+        Capture into the shared segment and return a view of it.
+
+        The array is overwritten by the next grab; copy it if you keep it.
+        """
+        if np is None:
+            raise RuntimeError("grab_array() needs numpy")
+        with self._lock:
+            self._grab_into_segment()
+            flat = np.frombuffer(self._buffer, dtype=np.uint8)
+            return flat.reshape(self.height, self._stride // 4, 4)[:, :self.width]
+
+    def grab(self) -> Image.Image:
+        with self._lock:
+            self._grab_into_segment()
+            # One pass: BGRX in shared memory -> RGB image we own
+            return Image.frombuffer(
+                'RGB', (self.width, self.height), self._buffer,
+                'raw', 'BGRX', self._stride, 1
+            )
+
+    def close(self):
+        with self._lock:
+            if not getattr(self, '_display', None):
+                return
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._x11.XFree(self._image)
+            self._libc.shmdt(self._shminfo.shmaddr)
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# ==================== BACKEND SELECTION ====================
+
+_default_backend: Optional[CaptureBackend] = None
+_default_lock = threading.Lock()
+
+
+def get_capture_backend(preferred: Optional[str] = None) -> CaptureBackend:
+    """
+    Get the process-wide capture backend, creating it on first use.
+
+    Args:
+        preferred: 'xshm' or 'pyautogui' (defaults to $CAPTURE_BACKEND, then auto)
+
+    Returns:
+        XShmCapture when available, otherwise PyAutoGUICapture
+    """
+    global _default_backend
+
+    with _default_lock:
+        if _default_backend is not None and preferred in (None, _default_backend.name):
+            return _default_backend
+
+        preferred = preferred or os.getenv("CAPTURE_BACKEND", "auto").lower()
+        backend = None
+
+        if preferred in ("auto", "xshm") and platform_is_x11():
+            try:
+                backend = XShmCapture()
+            except (OSError, RuntimeError) as e:
+                print(f"⚠️  XShm capture unavailable ({e}), falling back to pyautogui")
+
+        _default_backend = backend or PyAutoGUICapture()
+        return _default_backend
+
+
+def platform_is_x11() -> bool:
+    """True on Linux with an X display (not Wayland-only)."""
+    return platform.system().lower() == 'linux' and bool(os.environ.get('DISPLAY'))
+
+
+# ==================== REGIONS OF INTEREST ====================
+
+class Region:
+    """
+    A rectangle in global screen coordinates (the ones pyautogui clicks in).
+    """
+
+    def __init__(self, left: int, top: int, width: int, height: int):
+        self.left = int(left)
+        self.top = int(top)
+        self.width = int(width)
+        self.height = int(height)
+
+    def clamp(self, screen_width: int, screen_height: int) -> Optional['Region']:
+        """This region cut to the screen, or None if nothing is left."""
+        left, top = max(0, self.left), max(0, self.top)
+        right = min(screen_width, self.left + self.width)
+        bottom = min(screen_height, self.top + self.height)
+        if right <= left or bottom <= top:
+            return None
+        return Region(left, top, right - left, bottom - top)
+
+    def as_tuple(self) -> Tuple[int, int, int, int]:
+        return (self.left, self.top, self.width, self.height)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Region) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self) -> str:
+        return f"Region({self.left}, {self.top}, {self.width}x{self.height})"
+
+
+def active_window_region() -> Optional[Region]:
+    """
+    Bounds of the focused window, or None if they can't be determined.
+    """
+    system = platform.system().lower()
+    try:
+        if system == 'linux':
+            out = subprocess.run(
+                ['xdotool', 'getactivewindow', 'getwindowgeometry', '--shell'],
+                capture_output=True, text=True, timeout=1.0
+            ).stdout
+            values = dict(re.findall(r'(\w+)=(-?\d+)', out))
+            return Region(values['X'], values['Y'], values['WIDTH'], values['HEIGHT'])
+
+        if system == 'darwin':
+            script = (
+                'tell application "System Events" to tell (first process whose frontmost is true) '
+                'to get {position, size} of front window'
+            )
+            out = subprocess.run(
+                ['osascript', '-e', script], capture_output=True, text=True, timeout=1.0
+            ).stdout
+            left, top, width, height = [int(n) for n in re.findall(r'-?\d+', out)[:4]]
+            return Region(left, top, width, height)
+
+        if system == 'windows':
+            class RECT(ctypes.Structure):
+                _fields_ = [(name, ctypes.c_long) for name in ("left", "top", "right", "bottom")]
+            rect = RECT()
+            user32 = ctypes.windll.user32
+            if not user32.GetWindowRect(user32.GetForegroundWindow(), ctypes.byref(rect)):
+                return None
+            return Region(rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top)
+
+    except (OSError, KeyError, ValueError, subprocess.SubprocessError):
+        return None
+
+    return None
+
+
+def active_window_title() -> Optional[str]:
+    """
+    Title of the focused window, or None if it can't be determined.
+    """
+    system = platform.system().lower()
+    try:
+        if system == 'linux':
+            out = subprocess.run(
+                ['xdotool', 'getactivewindow', 'getwindowname'],
+                capture_output=True, text=True, timeout=1.0
+            )
+            return out.stdout.strip() if out.returncode == 0 else None
+
+        if system == 'darwin':
+            script = (
+                'tell application "System Events" to tell (first process whose frontmost is true) '
+                'to get {name, name of front window}'
+            )
+            out = subprocess.run(
+                ['osascript', '-e', script], capture_output=True, text=True, timeout=1.0
+            )
+            # "AppName, Window title": app name included so "Safari" matches too
+            return out.stdout.strip() if out.returncode == 0 else None
+
+        if system == 'windows':
+            user32 = ctypes.windll.user32
+            window = user32.GetForegroundWindow()
+            length = user32.GetWindowTextLengthW(window)
+            buffer = ctypes.create_unicode_buffer(length + 1)
+            user32.GetWindowTextW(window, buffer, length + 1)
+            return buffer.value
+
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+    return None
+
+
+def cursor_region(width: int, height: int) -> Region:
+    """A width x height box centered on the mouse cursor."""
+    x, y = pyautogui.position()
+    return Region(x - width // 2, y - height // 2, width, height)
@@ -0,0 +1,176 @@
+"""
+conversation.py - Multi-turn step conversation with screenshot aging
+
+In conversation mode the agent keeps one message list per run instead of
+sending a fresh single-turn prompt each step: every step adds a user turn
+(last result + new screenshot) and an assistant turn (the action JSON), so
+the model sees what the screen looked like before, not just a text log.
+
+Older screenshots are aged to keep image tokens and upload bytes bounded:
+the newest ones stay full size, older ones become small thumbnails, and
+the oldest are replaced by a short text note. Turns past max_turns are
+dropped, with the goal and a summary of the dropped steps put in front of
+the first remaining turn, so the goal never ages out with the first turn.
+
+Aging rewrites earlier messages, which invalidates the provider's prompt
+cache from that point on. So it runs in batches, every age_every turns;
+in between, everything already sent stays byte-identical and is read from
+the cache, with a single cache breakpoint on the newest turn.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from frames import Frame
+from encoding import EncodeResult
+
+DROPPED_SCREENSHOT = "[older screenshot omitted]"
+
+
+def image_block(encoded: EncodeResult) -> Dict[str, Any]:
+    """A messages API image block for an encoded screenshot."""
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": encoded.media_type,
+            "data": encoded.base64()
+        }
+    }
+
+
+class _Turn:
+    """One user message (+ the assistant reply once it arrives)."""
+
+    def __init__(self, text: str, frame: Frame, encoded: EncodeResult):
+        self.text = text
+        self.frame: Optional[Frame] = frame   # Released once the image is aged
+        self.image: Optional[Dict[str, Any]] = image_block(encoded)
+        self.image_state = "full"
+        self.preface = ""                     # Summary of dropped turns, if first
+        self.reply: Optional[str] = None
+
+
+class Conversation:
+    """
+    The message list of one run, with batched screenshot aging.
+    """
+
+    def __init__(self, keep_full: int = 2, keep_thumbnails: int = 4, max_turns: int = 16,
+                 age_every: int = 4, thumbnail_size: int = 384, thumbnail_quality: int = 60):
+        """
+        Args:
+            keep_full: Newest screenshots kept at full size after an aging pass
+            keep_thumbnails: Screenshots after those kept as thumbnails; older ones dropped
+            max_turns: Turns kept after an aging pass; older turns are summarized
+            age_every: Turns between aging passes (each pass costs one cache miss)
+            thumbnail_size: Longest side of aged screenshots, in pixels
+            thumbnail_quality: JPEG quality of aged screenshots
+        """
+        self.keep_full = keep_full
+        self.keep_thumbnails = keep_thumbnails
+        self.max_turns = max_turns
+        self.age_every = age_every
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_quality = thumbnail_quality
+        self.reset()
+
+    def reset(self, goal: str = ""):
+        """Start a new run's conversation; goal is kept in front once old turns are dropped."""
+        self.goal = goal
+        self.turns: List[_Turn] = []
+        self.pending: Optional[_Turn] = None
+        self.since_aging = 0
+        self.dropped_turns = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def ask(self, text: str, frame: Frame, encoded: EncodeResult) -> List[Dict[str, Any]]:
+        """
+        Messages for the next request: all turns so far plus a new user turn.
+
+        The new turn only becomes part of the conversation once reply() is
+        called, so a failed request can simply be asked again.
+        """
+        self.pending = _Turn(text, frame, encoded)
+        messages = []
+        for turn in self.turns:
+            messages.append({"role": "user", "content": self._content(turn)})
+            messages.append({"role": "assistant", "content": turn.reply})
+        content = self._content(self.pending)
+        # Cache everything up to here; the next request extends this prefix
+        content[-1] = dict(content[-1], cache_control={"type": "ephemeral"})
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def reply(self, text: str, summarize: Optional[Callable[[], str]] = None):
+        """
+        Commit the pending turn with the model's reply.
+
+        Args:
+            text: The assistant reply (the action JSON)
+            summarize: Returns a summary of the run so far; called only when
+                turns are dropped, to stand in for them
+        """
+        if self.pending is None:
+            return
+        self.pending.reply = text
+        self.turns.append(self.pending)
+        self.pending = None
+
+        self.since_aging += 1
+        if self.since_aging >= self.age_every:
+            self.since_aging = 0
+            self._age(summarize)
+
+    def _content(self, turn: _Turn) -> List[Dict[str, Any]]:
+        content = []
+        if turn.preface:
+            content.append({"type": "text", "text": turn.preface})
+        content.append({"type": "text", "text": turn.text})
+        if turn.image is not None:
+            content.append(turn.image)
+        elif turn.image_state == "dropped":
+            content.append({"type": "text", "text": DROPPED_SCREENSHOT})
+        return content
+
+    def _age(self, summarize: Optional[Callable[[], str]]):
+        """Thumbnail/drop old screenshots and old turns (one batched rewrite)."""
+        if len(self.turns) > self.max_turns:
+            drop = len(self.turns) - self.max_turns
+            self.turns = self.turns[drop:]
+            self.dropped_turns += drop
+            # The first turn held the goal; it has to survive the drop
+            preface = f"Goal: {self.goal}\n\n" if self.goal else ""
+            preface += f"(The first {self.dropped_turns} steps of this conversation were removed to save space.)"
+            if summarize is not None:
+                preface += f"\n{summarize()}"
+            self.turns[0].preface = preface
+
+        # Ages count back from the newest turn (age 0); the next ask() adds a newer one
+        for age, turn in enumerate(reversed(self.turns), start=1):
+            if age <= self.keep_full:
+                continue
+            if age <= self.keep_full + self.keep_thumbnails:
+                if turn.image_state == "full":
+                    self._to_thumbnail(turn)
+            elif turn.image_state != "dropped":
+                turn.image = None
+                turn.frame = None
+                turn.image_state = "dropped"
+
+    def _to_thumbnail(self, turn: _Turn):
+        frame = turn.frame
+        size = frame.thumbnail(self.thumbnail_size).size
+        turn.image = image_block(frame.encoded(size, "JPEG", self.thumbnail_quality))
+        turn.image_state = "thumbnail"
+        turn.frame = None  # Don't keep full-resolution frames alive
+
+    def stats(self) -> Dict[str, int]:
+        states = [turn.image_state for turn in self.turns]
+        return {
+            "turns": len(self.turns),
+            "dropped_turns": self.dropped_turns,
+            "full_images": states.count("full"),
+            "thumbnails": states.count("thumbnail"),
+        }
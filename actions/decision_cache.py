@@ -0,0 +1,185 @@
+"""
+decision_cache.py - Reuse model decisions for screens we've already seen
+
+The same few commands come in many times a day, and each time the agent
+asks the model the same question about a near-identical screen. The
+decision cache remembers next_action()'s answer under a key made of
+
+- the normalized goal ("Open  Safari!" == "open safari"),
+- the last few actions and their outcomes, and
+- a perceptual hash of the downscaled screen (Frame.perceptual_hash()).
+
+A lookup matches the goal and recent actions exactly and the screen hash
+within max_distance bits, so a ticking clock or a blinking caret doesn't
+cause a miss. Entries expire after ttl seconds and the least recently used
+are evicted beyond max_entries. A decision whose action then fails is
+forgotten, so one bad answer isn't replayed forever.
+
+With a path, entries are loaded from and saved to a JSON file, so the
+cache survives restarts.
+
+Usage:
+    cache = DecisionCache(path="~/.jarvis/decisions.json")
+    agent = StepAgent(anthropic_api_key=key, decision_cache=cache)
+"""
+
+import collections
+import copy
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from frames import Frame
+from metrics import DecisionCacheStats
+
+# (normalized goal, recent actions, screen region) -> must match exactly
+Context = Tuple[str, str, str]
+
+
+def normalize_goal(goal: str) -> str:
+    """Lowercase, punctuation dropped, whitespace collapsed."""
+    return " ".join(re.sub(r"[^\w\s]", " ", goal.lower()).split())
+
+
+def recent_actions(history: List[Dict[str, Any]], count: int) -> str:
+    """The last `count` steps as a stable string (action, params, status)."""
+    steps = [[h['action'], h.get('params') or {}, h.get('status')] for h in history[-count:]] if count else []
+    return json.dumps(steps, sort_keys=True, default=str)
+
+
+class DecisionCache:
+    """
+    LRU + TTL cache of next_action() decisions, keyed by screen, goal and recent steps.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 7 * 24 * 3600,
+                 path: Optional[str] = None, hash_size: int = 16,
+                 max_distance: int = 10, history_steps: int = 3):
+        """
+        Args:
+            max_entries: Entries kept; the least recently used go first
+            ttl: Seconds an entry stays valid
+            path: JSON file to persist entries in (None: memory only)
+            hash_size: Perceptual hash grid size (hash_size² bits)
+            max_distance: Differing hash bits that still count as the same screen
+            history_steps: Recent steps that are part of the key
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = os.path.expanduser(path) if path else None
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.history_steps = history_steps
+        self.stats = DecisionCacheStats()
+        self._lock = threading.Lock()
+        # (context, screen hash) -> {"action": ..., "stored_at": ...}, oldest use first
+        self._entries: "collections.OrderedDict[Tuple[Context, int], Dict[str, Any]]" = collections.OrderedDict()
+        if self.path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, frame: Frame, goal: str, history: List[Dict[str, Any]]) -> Tuple[Context, int]:
+        """Cache key for deciding on frame, for goal, after history."""
+        context = (normalize_goal(goal), recent_actions(history, self.history_steps), repr(frame.region.as_tuple()))
+        return context, frame.perceptual_hash(self.hash_size)
+
+    def get(self, key: Tuple[Context, int]) -> Optional[Dict[str, Any]]:
+        """
+        The cached decision for key (a copy), or None.
+
+        Returns:
+            Action dict as next_action() returned it
+        """
+        context, screen = key
+        now = time.time()
+        with self._lock:
+            found = None
+            if key in self._entries:
+                found = key
+            else:
+                # Same goal and steps, a screen a few bits off; nearest wins
+                best = self.max_distance + 1
+                for (other_context, other_screen) in self._entries:
+                    if other_context == context:
+                        distance = bin(screen ^ other_screen).count("1")
+                        if distance < best:
+                            found, best = (other_context, other_screen), distance
+
+            if found is not None and now - self._entries[found]['stored_at'] > self.ttl:
+                del self._entries[found]
+                self.stats.expired()
+                found = None
+            if found is None:
+                self.stats.miss()
+                return None
+
+            self._entries.move_to_end(found)
+            self.stats.hit()
+            return copy.deepcopy(self._entries[found]['action'])
+
+    def put(self, key: Tuple[Context, int], action_dict: Dict[str, Any]):
+        """Remember action_dict as the decision for key."""
+        with self._lock:
+            self._entries[key] = {"action": copy.deepcopy(action_dict), "stored_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evicted()
+        self.stats.stored()
+        self.save()
+
+    def forget(self, key: Tuple[Context, int]):
+        """Drop key's decision (e.g. its action failed)."""
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+        if removed:
+            self.stats.forgot()
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.save()
+
+    # ==================== PERSISTENCE ====================
+
+    def load(self):
+        """Read entries from path (a missing or unreadable file means an empty cache)."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("hash_size") != self.hash_size:
+            return  # Hashes of another size can't be compared
+
+        now = time.time()
+        with self._lock:
+            for entry in data.get("entries", []):
+                if now - entry["stored_at"] <= self.ttl:
+                    key = (tuple(entry["context"]), int(entry["screen"], 16))
+                    self._entries[key] = {"action": entry["action"], "stored_at": entry["stored_at"]}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        print(f"🗃️  Decision cache: {len(self._entries)} entries loaded from {self.path}")
+
+    def save(self):
+        """Write entries to path, atomically (no-op without a path)."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [
+                {"context": list(context), "screen": format(screen, "x"),
+                 "action": entry["action"], "stored_at": entry["stored_at"]}
+                for (context, screen), entry in self._entries.items()
+            ]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            json.dump({"hash_size": self.hash_size, "entries": entries}, f)
+        os.replace(temp, self.path)
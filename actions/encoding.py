@@ -0,0 +1,375 @@
+"""
+encoding.py - Screenshot encoders with a predictable cost
+
+encode_image() is a plain one-shot encode in any PIL format.
+
+encode_jpeg_to_budget() hits a byte budget in one full-size encode (two at
+most). It predicts the right JPEG quality from cheap trial encodes of a small
+tile sample, and shrinks the resolution when quality alone can't get there.
+
+encode_adaptive() classifies the frame first (color count and edge density
+on a small sample). Text-heavy UIs go out as palette PNG or lossless WebP,
+photo-like screens as JPEG; codec_stats records which codec won.
+
+Encoders write into a per-thread output buffer that grows once and is then
+reused, and trial encodes only count bytes. Encodes that get thrown away (a
+budget pass that came out too big, a losing codec candidate) are never
+copied out of that buffer; only the result that is kept becomes bytes, one
+exact-size copy, so a long session doesn't churn through multi-MB BytesIO
+objects every step.
+"""
+
+import base64
+import math
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageFilter, features
+
+
+# Anthropic rejects images over 5MB of base64; base64 adds a third on top
+DEFAULT_MAX_BYTES = int(3.5 * 1024 * 1024)
+
+
+class EncodeResult:
+    """
+    An encoded image and how it was produced.
+    """
+
+    def __init__(self, data: bytes, format: str, quality: int, size: Tuple[int, int], passes: int,
+                 kind: Optional[str] = None):
+        self.data = data
+        self.format = format
+        self.quality = quality
+        self.size = size
+        self.passes = passes  # Full-size encodes it took
+        self.kind = kind  # 'text' or 'photo' when chosen by encode_adaptive()
+        self._base64: Optional[str] = None
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self.format.lower()}"
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self.data)
+
+    def base64(self) -> str:
+        # Computed once: retries and several consumers may send the same bytes
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode('utf-8')
+        return self._base64
+
+    def __repr__(self) -> str:
+        return (
+            f"EncodeResult({self.format} {self.size[0]}x{self.size[1]} "
+            f"q={self.quality} {self.num_bytes / 1024:.0f}KB passes={self.passes})"
+        )
+
+
+class _ReusableBuffer:
+    """
+    Write-only file over a bytearray that grows as needed and is never freed.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._length = 0
+        self._view: Optional[memoryview] = None
+
+    def reset(self):
+        if self._view is not None:
+            # A bytearray can't grow while a view of it is alive; stale views fail loudly
+            self._view.release()
+            self._view = None
+        self._length = 0
+
+    def write(self, data) -> int:
+        n = len(data)
+        # Slice assignment past the end grows the bytearray in place
+        self._buffer[self._length:self._length + n] = data
+        self._length += n
+        return n
+
+    def tell(self) -> int:
+        return self._length
+
+    def getvalue(self) -> memoryview:
+        """The bytes written since reset(), as a view valid until the next reset()."""
+        self._view = memoryview(self._buffer)[:self._length]
+        return self._view
+
+
+class _ByteCounter:
+    """Write-only file that just counts, for trial encodes."""
+
+    def __init__(self):
+        self.count = 0
+
+    def write(self, data) -> int:
+        self.count += len(data)
+        return len(data)
+
+
+_local = threading.local()
+
+
+def _output_buffer() -> _ReusableBuffer:
+    buffer = getattr(_local, 'output', None)
+    if buffer is None:
+        buffer = _local.output = _ReusableBuffer()
+    buffer.reset()
+    return buffer
+
+
+def _encode(image: Image.Image, format: str, **params) -> memoryview:
+    """Encode into this thread's output buffer; the view is valid until its next encode."""
+    buffer = _output_buffer()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+def _encoded_size(image: Image.Image, format: str, **params) -> int:
+    counter = _ByteCounter()
+    image.save(counter, format=format, **params)
+    return counter.count
+
+
+def encode_image(image: Image.Image, format: str = "JPEG", quality: int = 90) -> EncodeResult:
+    """
+    Encode an image once in the given format.
+
+    Args:
+        image: RGB image to encode
+        format: 'JPEG', 'WEBP' or 'PNG' (quality is ignored for PNG)
+        quality: Lossy quality
+    """
+    format = format.upper()
+    if format == "PNG":
+        data = _encode(image, "PNG")
+    else:
+        data = _encode(image, format, quality=quality)
+    return EncodeResult(bytes(data), format, quality, image.size, 1)
+
+
+def _tile_mosaic(image: Image.Image, tiles_per_side: int, tile: int = 64) -> Image.Image:
+    """
+    Sample a grid of native-resolution tiles into one small image.
+
+    Unlike a thumbnail, tiles keep the per-8x8-block detail JPEG pays for,
+    so their encoded size scales up to the full frame by pixel count.
+    """
+    width, height = image.size
+    tile = min(tile, width, height)
+    size = (tile * tiles_per_side, tile * tiles_per_side)
+
+    # Tiles cover the whole mosaic, so the previous one can be painted over
+    mosaic = getattr(_local, 'mosaic', None)
+    if mosaic is None or mosaic.size != size:
+        mosaic = _local.mosaic = Image.new('RGB', size)
+
+    for row in range(tiles_per_side):
+        for col in range(tiles_per_side):
+            # Tile centers on an even grid, snapped to JPEG block boundaries
+            left = ((width - tile) * (2 * col + 1) // (2 * tiles_per_side)) // 8 * 8
+            top = ((height - tile) * (2 * row + 1) // (2 * tiles_per_side)) // 8 * 8
+            mosaic.paste(image.crop((left, top, left + tile, top + tile)), (col * tile, row * tile))
+
+    return mosaic
+
+
+def _predict_quality(trial: Image.Image, scale: float, max_bytes: int,
+                     min_quality: int, max_quality: int) -> Tuple[int, float]:
+    """
+    Binary search the highest quality whose trial size, scaled up by the
+    pixel ratio, fits the budget.
+
+    Returns:
+        (quality, predicted full-size bytes at that quality)
+    """
+    lo, hi = min_quality, max_quality
+    best_quality = min_quality
+    best_predicted = _encoded_size(trial, "JPEG", quality=min_quality) * scale
+
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        predicted = _encoded_size(trial, "JPEG", quality=mid) * scale
+        if predicted <= max_bytes:
+            best_quality, best_predicted = mid, predicted
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    return best_quality, best_predicted
+
+
+def encode_jpeg_to_budget(
+    image: Image.Image,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_quality: int = 85,
+    min_quality: int = 50,
+    tiles_per_side: int = 8
+) -> EncodeResult:
+    """
+    Encode an RGB image as JPEG under max_bytes.
+
+    Args:
+        image: RGB image to encode
+        max_bytes: Size budget for the encoded bytes
+        max_quality: Quality to use when the budget allows it
+        min_quality: Lowest quality before the resolution is reduced instead
+        tiles_per_side: Grid size of the tile sample used for prediction
+
+    Returns:
+        EncodeResult with the chosen quality and size
+    """
+    width, height = image.size
+
+    # Trial encodes on a 512x512 sample are a few ms each, even for a 4K frame
+    trial = _tile_mosaic(image, tiles_per_side)
+    scale = (width * height) / float(trial.width * trial.height)
+
+    quality, predicted = _predict_quality(trial, scale, max_bytes, min_quality, max_quality)
+
+    # Even the lowest quality is too big: trade resolution instead
+    target = image
+    if predicted > max_bytes:
+        shrink = math.sqrt(max_bytes / predicted) * 0.95
+        target = image.resize(
+            (max(1, int(width * shrink)), max(1, int(height * shrink))),
+            Image.Resampling.BILINEAR
+        )
+
+    data = _encode(target, "JPEG", quality=quality, optimize=True)
+    passes = 1
+
+    # Prediction missed: one corrective pass, scaling by how far off we were
+    if len(data) > max_bytes:
+        shrink = math.sqrt(max_bytes / len(data)) * 0.95
+        target = target.resize(
+            (max(1, int(target.width * shrink)), max(1, int(target.height * shrink))),
+            Image.Resampling.BILINEAR
+        )
+        data = _encode(target, "JPEG", quality=quality, optimize=True)
+        passes = 2
+
+    return EncodeResult(bytes(data), "JPEG", quality, target.size, passes)
+
+
+# ==================== ADAPTIVE CODEC SELECTION ====================
+
+# A 512x512 sample of a text/UI screen rarely has more than a few hundred colors
+TEXT_MAX_COLORS = 1024
+# ...and a moderately busy one can still be text if it is mostly sharp edges
+TEXT_MIN_EDGE_DENSITY = 0.15
+PALETTE_MAX_COLORS = 256
+
+_HAS_WEBP = features.check('webp')
+
+
+def classify_image(image: Image.Image) -> Dict[str, Any]:
+    """
+    Cheaply decide whether a frame looks like text/UI or like a photo.
+
+    Returns:
+        {"kind": "text" | "photo", "colors": int or None (too many), "edge_density": float}
+    """
+    sample = _tile_mosaic(image, 8)
+    colors = sample.getcolors(4096)
+    n_colors = len(colors) if colors is not None else None
+
+    histogram = sample.convert('L').filter(ImageFilter.FIND_EDGES).histogram()
+    edge_density = sum(histogram[32:]) / float(sum(histogram))
+
+    if n_colors is not None and (n_colors <= TEXT_MAX_COLORS or edge_density >= TEXT_MIN_EDGE_DENSITY):
+        kind = "text"
+    else:
+        kind = "photo"
+
+    return {"kind": kind, "colors": n_colors, "edge_density": edge_density}
+
+
+def _lossless_candidates(image: Image.Image, n_colors: int):
+    """
+    Lossless (or visually lossless) encodings worth trying for a text-like frame,
+    as (format, data) pairs; each data view is only valid until the next pair.
+    """
+    if n_colors <= PALETTE_MAX_COLORS:
+        # The sample may miss a few rare colors; a full palette absorbs them
+        palette = image.quantize(PALETTE_MAX_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        yield "PNG", _encode(palette, "PNG")
+    if _HAS_WEBP:
+        yield "WEBP", _encode(image, "WEBP", lossless=True, quality=50, method=2)
+
+
+def encode_adaptive(
+    image: Image.Image,
+    consumer: str = "claude",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    jpeg_quality: Optional[int] = None
+) -> EncodeResult:
+    """
+    Encode with the smallest acceptable codec for this kind of frame.
+
+    Args:
+        image: RGB image to encode
+        consumer: Who it's for, only used to label codec_stats
+        max_bytes: Size budget; a lossless pick that exceeds it falls back to JPEG
+        jpeg_quality: Fixed JPEG quality for photo-like frames (default: fit max_bytes)
+
+    Returns:
+        EncodeResult with kind set to the detected frame type
+    """
+    info = classify_image(image)
+
+    best = None
+    if info["kind"] == "text":
+        for format, data in _lossless_candidates(image, info["colors"]):
+            # Only the best so far is copied out of the output buffer
+            if best is None or len(data) < best.num_bytes:
+                best = EncodeResult(bytes(data), format, 100, image.size, 1)
+
+    if best is None or best.num_bytes > max_bytes:
+        if jpeg_quality is None:
+            best = encode_jpeg_to_budget(image, max_bytes)
+        else:
+            best = encode_image(image, "JPEG", jpeg_quality)
+
+    best.kind = info["kind"]
+    codec_stats.record(consumer, info, best)
+    return best
+
+
+class CodecStats:
+    """
+    Which codec won, per consumer and frame kind, and how many bytes it cost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+
+    def record(self, consumer: str, info: Dict[str, Any], result: EncodeResult):
+        key = (consumer, info["kind"], result.format)
+        with self._lock:
+            entry = self.counts.setdefault(key, {"count": 0, "bytes": 0})
+            entry["count"] += 1
+            entry["bytes"] += result.num_bytes
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{"claude/text/WEBP": {"count": n, "avg_kb": x}, ...}"""
+        with self._lock:
+            return {
+                "/".join(key): {
+                    "count": entry["count"],
+                    "avg_kb": round(entry["bytes"] / entry["count"] / 1024, 1)
+                }
+                for key, entry in self.counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+codec_stats = CodecStats()
@@ -0,0 +1,430 @@
+"""
+frames.py - Capture once, encode per consumer
+
+A Frame is one screenshot of the desktop. Every consumer (Claude, UI-TARS,
+thumbnails, debug dumps) asks the frame for the encoding it needs, and each
+encoding is computed at most once per frame.
+
+FramePipeline hands out the current frame. It only captures a new one when
+asked to, or after the screen has been invalidated by an action.
+
+Frames may cover only a region of interest (the active window, a fixed
+rectangle or a box around the cursor). Frame.to_screen() maps coordinates a
+model gives for any encoding of the frame back to global screen space.
+
+FrameGrabber optionally keeps capturing in a background thread, so the
+pipeline can hand out an already-captured frame instead of blocking on one.
+"""
+
+import base64
+import collections
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+import pyautogui
+
+from capture import Region, active_window_region, cursor_region, get_capture_backend
+from encoding import DEFAULT_MAX_BYTES, EncodeResult, encode_adaptive, encode_image, encode_jpeg_to_budget
+
+
+class Frame:
+    """
+    One captured screenshot plus its memoized encodings.
+    """
+
+    def __init__(self, image: Image.Image, captured_at: float = None, region: Optional[Region] = None):
+        self.image = image
+        # time.monotonic() when the grab started
+        self.captured_at = captured_at if captured_at is not None else time.monotonic()
+        # Where the image sits on screen, in screen coordinates
+        self.region = region or Region(0, 0, image.width, image.height)
+        self._encodings: Dict[Tuple, Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    def to_screen(self, x: float, y: float, image_size: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+        """
+        Map a point in an encoding of this frame to global screen coordinates.
+
+        Args:
+            x, y: Point in the encoded image (or in a model's declared resolution)
+            image_size: (width, height) of that image; defaults to the frame itself
+        """
+        width, height = image_size or self.size
+        return (
+            round(self.region.left + x * self.region.width / width),
+            round(self.region.top + y * self.region.height / height)
+        )
+
+    def from_screen(self, x: float, y: float, image_size: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+        """Inverse of to_screen(): global screen point -> point in the encoded image."""
+        width, height = image_size or self.size
+        return (
+            round((x - self.region.left) * width / self.region.width),
+            round((y - self.region.top) * height / self.region.height)
+        )
+
+    def crop(self, region: Region) -> 'Frame':
+        """
+        A frame showing only region (in screen coordinates) of this one.
+
+        Memoized per region: the grabber hands out the same frame to several
+        captures, and each crop keeps its own RGB conversion and encodings.
+        """
+        return self._memoize(('crop', region.as_tuple()), lambda: self._crop(region))
+
+    def _crop(self, region: Region) -> 'Frame':
+        scale_x = self.image.width / self.region.width
+        scale_y = self.image.height / self.region.height
+        box = (
+            round((region.left - self.region.left) * scale_x),
+            round((region.top - self.region.top) * scale_y),
+            round((region.left - self.region.left + region.width) * scale_x),
+            round((region.top - self.region.top + region.height) * scale_y),
+        )
+        return Frame(self.image.crop(box), captured_at=self.captured_at, region=region)
+
+    def _memoize(self, key: Tuple, build: Callable[[], Any]) -> Any:
+        """Return the cached value for key, building it on first use."""
+        with self._lock:
+            if key not in self._encodings:
+                self._encodings[key] = build()
+            return self._encodings[key]
+
+    # ==================== DERIVED IMAGES ====================
+
+    def rgb(self) -> Image.Image:
+        """The frame as RGB, with transparency flattened onto white (converted once per frame)."""
+        def build():
+            image = self.image
+            if image.mode == 'RGB':
+                return image
+            # Screenshots are opaque: drop alpha in one pass, no white canvas or mask
+            if image.mode == 'RGBA' and image.getextrema()[3][0] < 255:
+                return Image.alpha_composite(
+                    Image.new('RGBA', image.size, (255, 255, 255, 255)), image
+                ).convert('RGB')
+            return image.convert('RGB')
+        return self._memoize(('rgb',), build)
+
+    def resized(self, size: Tuple[int, int]) -> Image.Image:
+        """The frame resized to exactly (width, height)."""
+        size = (int(size[0]), int(size[1]))
+        if size == self.size:
+            return self.rgb()
+        return self._memoize(
+            ('resized', size),
+            # reducing_gap box-reduces first, then LANCZOS on the smaller image
+            lambda: self.rgb().resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        )
+
+    def thumbnail(self, max_dimension: int) -> Image.Image:
+        """The frame scaled down (keeping aspect ratio) to fit max_dimension."""
+        if max(self.size) <= max_dimension:
+            return self.rgb()
+        width, height = self.size
+        scale = max_dimension / max(width, height)
+        return self.resized((max(1, round(width * scale)), max(1, round(height * scale))))
+
+    def changed_fraction(self, other: 'Frame', max_dimension: int = 256, tolerance: int = 16) -> float:
+        """
+        Share of the screen that differs between this frame and other.
+
+        Compares grayscale thumbnails, so it is cheap and ignores encoder noise.
+
+        Args:
+            other: Frame to compare with
+            max_dimension: Thumbnail size used for the comparison
+            tolerance: Per-pixel gray level difference that still counts as unchanged
+
+        Returns:
+            0.0 (same screen) to 1.0 (everything changed, or a different region)
+        """
+        if other.region != self.region:
+            return 1.0
+        ours = self._memoize(('gray', max_dimension), lambda: self.thumbnail(max_dimension).convert('L'))
+        theirs = other._memoize(('gray', max_dimension), lambda: other.thumbnail(max_dimension).convert('L'))
+        if ours.size != theirs.size:
+            return 1.0
+        changed = ImageChops.difference(ours, theirs).point(lambda v: 255 if v > tolerance else 0)
+        return changed.histogram()[255] / (changed.width * changed.height)
+
+    def perceptual_hash(self, hash_size: int = 16) -> int:
+        """
+        Difference hash (dHash) of the frame: hash_size² bits, one per pair of
+        horizontally adjacent cells of a tiny grayscale copy, set where the left
+        cell is brighter. Near-identical screens get hashes a few bits apart.
+
+        Compare two hashes with bin(a ^ b).count("1").
+        """
+        def build():
+            # From the same small grayscale copy changed_fraction() uses
+            small = self._memoize(('gray', 256), lambda: self.thumbnail(256).convert('L'))
+            gray = small.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+            pixels = list(gray.getdata())
+            bits = 0
+            for row in range(hash_size):
+                for col in range(hash_size):
+                    left = pixels[row * (hash_size + 1) + col]
+                    bits = (bits << 1) | (left > pixels[row * (hash_size + 1) + col + 1])
+            return bits
+        return self._memoize(('dhash', hash_size), build)
+
+    # ==================== ENCODINGS ====================
+
+    def jpeg(self, max_dimension: int = 1920, max_bytes: int = DEFAULT_MAX_BYTES) -> EncodeResult:
+        """
+        JPEG for Claude: fits max_dimension and stays under max_bytes.
+        """
+        return self._memoize(
+            ('jpeg', max_dimension, max_bytes),
+            lambda: encode_jpeg_to_budget(self.thumbnail(max_dimension), max_bytes)
+        )
+
+    def jpeg_base64(self, max_dimension: int = 1920, max_bytes: int = DEFAULT_MAX_BYTES) -> str:
+        """JPEG for Claude as base64 (see jpeg())."""
+        return self._memoize(
+            ('jpeg_base64', max_dimension, max_bytes),
+            lambda: self.jpeg(max_dimension, max_bytes).base64()
+        )
+
+    def fit_size(self, max_size: Tuple[int, int]) -> Tuple[int, int]:
+        """Largest size within max_size with the frame's aspect ratio (never upscaled)."""
+        width, height = self.size
+        scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def encoded(self, size: Tuple[int, int], format: str = "JPEG", quality: int = 90) -> EncodeResult:
+        """The frame at exactly size, encoded once as format."""
+        size = (int(size[0]), int(size[1]))
+        return self._memoize(
+            ('encoded', size, format.upper(), quality),
+            lambda: encode_image(self.resized(size), format, quality)
+        )
+
+    def adaptive(self, size: Tuple[int, int], consumer: str = "claude",
+                 max_bytes: int = DEFAULT_MAX_BYTES, jpeg_quality: Optional[int] = None) -> EncodeResult:
+        """The frame at size, in the smallest acceptable codec (see encode_adaptive())."""
+        size = (int(size[0]), int(size[1]))
+        return self._memoize(
+            ('adaptive', size, consumer, max_bytes, jpeg_quality),
+            lambda: encode_adaptive(self.resized(size), consumer, max_bytes, jpeg_quality)
+        )
+
+    def png_bytes(self, size: Optional[Tuple[int, int]] = None) -> bytes:
+        """Lossless PNG, optionally at a given (width, height)."""
+        return self._memoize(
+            ('png_bytes', size),
+            lambda: encode_image(self.resized(size) if size else self.image, "PNG").data
+        )
+
+    def png_base64(self, size: Optional[Tuple[int, int]] = None) -> str:
+        """Lossless PNG as base64, optionally at a given (width, height)."""
+        return self._memoize(
+            ('png_base64', size),
+            lambda: base64.b64encode(self.png_bytes(size)).decode('utf-8')
+        )
+
+
+class FrameGrabber:
+    """
+    Background thread that keeps the newest few frames in a ring buffer.
+
+    Frames are stamped with the time their grab *started*, so a frame from
+    frame_after(t) is guaranteed to show the screen as it was after t.
+    """
+
+    def __init__(self, capture: Callable[[], Image.Image], capacity: int = 4, interval: float = 0.1,
+                 make_frame: Callable[[Image.Image, float], Frame] = None):
+        self._capture = capture
+        self._make_frame = make_frame or (lambda image, started: Frame(image, captured_at=started))
+        self.interval = interval
+        self._frames = collections.deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.grabs = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="frame-grabber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _loop(self):
+        while self._running:
+            started = time.monotonic()
+            try:
+                frame = self._make_frame(self._capture(), started)
+            except Exception as e:
+                print(f"⚠️  Background capture failed: {e}")
+                time.sleep(max(self.interval, 0.5))
+                continue
+
+            with self._cond:
+                self._frames.append(frame)
+                self.grabs += 1
+                self._cond.notify_all()
+
+            elapsed = time.monotonic() - started
+            if elapsed < self.interval:
+                time.sleep(self.interval - elapsed)
+
+    def latest(self) -> Optional[Frame]:
+        """The newest frame, or None if nothing has been captured yet."""
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def frame_after(self, t: float, timeout: float = 2.0, newest: bool = False) -> Optional[Frame]:
+        """
+        The first frame whose grab started at or after t (a time.monotonic() value).
+
+        Blocks until one arrives; returns None on timeout or if stopped.
+        With newest=True, returns the newest buffered frame instead of the first.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._frames and self._frames[-1].captured_at >= t:
+                    if newest:
+                        return self._frames[-1]
+                    for frame in self._frames:
+                        if frame.captured_at >= t:
+                            return frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._cond.wait(remaining)
+
+
+class FramePipeline:
+    """
+    Shares one frame per step between everything that needs the screen.
+
+    Call capture() at the start of a step (or let current() do it lazily),
+    and invalidate() after anything that may have changed the screen.
+
+    With start_background(), capture() takes the first background frame
+    grabbed after the last invalidate() instead of grabbing synchronously.
+    """
+
+    def __init__(self, capture: Callable[[], Image.Image] = None):
+        self._capture = capture or get_capture_backend().grab
+        self._frame: Optional[Frame] = None
+        self._lock = threading.Lock()
+        self._invalidated_at = 0.0
+        self.grabber: Optional[FrameGrabber] = None
+        self.captures = 0
+
+        # Captures are full-screen in physical pixels; regions are logical
+        self.screen_width, self.screen_height = pyautogui.size()
+        self.roi_mode: Optional[str] = None
+        self.roi_rect: Optional[Region] = None
+        self.roi_cursor_size: Tuple[int, int] = (1280, 800)
+
+    def set_roi(self, mode: Optional[str], rect: Optional[Tuple[int, int, int, int]] = None,
+                cursor_size: Tuple[int, int] = (1280, 800)):
+        """
+        Restrict captured frames to a region of interest.
+
+        Args:
+            mode: None (full screen), 'window' (active window), 'rect' or 'cursor'
+            rect: (left, top, width, height) for mode='rect'
+            cursor_size: (width, height) of the box around the cursor for mode='cursor'
+        """
+        if mode not in (None, 'window', 'rect', 'cursor'):
+            raise ValueError(f"Unknown ROI mode: {mode}")
+        if mode == 'rect' and rect is None:
+            raise ValueError("ROI mode 'rect' needs a rect")
+        self.roi_mode = mode
+        self.roi_rect = Region(*rect) if rect else None
+        self.roi_cursor_size = cursor_size
+
+    def _roi_region(self) -> Optional[Region]:
+        """The current region of interest, or None for the full screen."""
+        if self.roi_mode == 'window':
+            region = active_window_region()
+        elif self.roi_mode == 'rect':
+            region = self.roi_rect
+        elif self.roi_mode == 'cursor':
+            region = cursor_region(*self.roi_cursor_size)
+        else:
+            return None
+        # Fall back to the full screen if the window can't be found
+        return region.clamp(self.screen_width, self.screen_height) if region else None
+
+    def _full_frame(self, image: Image.Image, captured_at: float = None) -> Frame:
+        return Frame(image, captured_at=captured_at,
+                     region=Region(0, 0, self.screen_width, self.screen_height))
+
+    def start_background(self, capacity: int = 4, interval: float = 0.1):
+        """Start capturing continuously in a background thread."""
+        if self.grabber is None:
+            self.grabber = FrameGrabber(self._capture, capacity=capacity, interval=interval,
+                                        make_frame=self._full_frame)
+        self.grabber.start()
+
+    def stop_background(self):
+        if self.grabber:
+            self.grabber.stop()
+
+    def capture(self) -> Frame:
+        """Grab a new frame and make it the current one."""
+        frame = None
+        if self.grabber and self.grabber.running:
+            frame = self.grabber.frame_after(self._invalidated_at, newest=True)
+        if frame is None:
+            frame = self._full_frame(self._capture())
+        frame = self._apply_roi(frame)
+
+        with self._lock:
+            self._frame = frame
+            self.captures += 1
+        return frame
+
+    def peek(self) -> Frame:
+        """
+        Grab a frame now without making it the current one, e.g. to look at
+        the screen while an action is still running.
+        """
+        frame = None
+        if self.grabber and self.grabber.running:
+            frame = self.grabber.frame_after(time.monotonic(), newest=True)
+        if frame is None:
+            frame = self._full_frame(self._capture())
+        return self._apply_roi(frame)
+
+    def _apply_roi(self, frame: Frame) -> Frame:
+        region = self._roi_region()
+        return frame.crop(region) if region is not None else frame
+
+    def current(self) -> Frame:
+        """The current frame, capturing one if there is none."""
+        with self._lock:
+            frame = self._frame
+        return frame if frame is not None else self.capture()
+
+    def invalidate(self):
+        """Mark the current frame as stale (the screen has changed)."""
+        with self._lock:
+            self._frame = None
+            self._invalidated_at = time.monotonic()
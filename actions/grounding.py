@@ -1,67 +1,80 @@
 # grounding.py - WITH COORDINATE SCALING
 
 import requests
-import base64
 import re
 import pyautogui
-import io
-import os
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
+from frames import Frame, FramePipeline
+from request_body import IMAGE_PLACEHOLDER, StreamingJSONBody
+from hedging import Hedger
+from retry import RETRY_STATUSES, CircuitBreaker, RetryPolicy
 
 class GroundingModel:
     def __init__(
         self, 
         endpoint_url: str, 
         hf_token: str,
-        model_resolution: Tuple[int, int] = (1920, 1080)  # UI-TARS training resolution
+        model_resolution: Tuple[int, int] = (1920, 1080),  # UI-TARS training resolution
+        frames: Optional[FramePipeline] = None,
+        image_format: str = "auto",
+        image_quality: int = 90,
+        hedge: bool = False,
+        hedge_percentile: float = 0.9,
+        retry_policy: Optional[RetryPolicy] = None
     ):
         self.endpoint_url = endpoint_url
         self.hf_token = hf_token
         self.model_width, self.model_height = model_resolution
         
+        # Upload format: 'auto' picks PNG/WebP for text-heavy screens and JPEG
+        # (at image_quality) for photo-like ones; or force 'JPEG', 'PNG', 'WEBP'
+        self.image_format = image_format
+        self.image_quality = image_quality
+        
+        # Shared with StepAgent so one step captures the screen only once
+        self.frames = frames or FramePipeline()
+        
+        # Optionally re-send a grounding request that's slower than usual
+        self.hedger = Hedger(percentile=hedge_percentile) if hedge else None
+        
+        # Back off on 429/5xx and connection errors; fail fast once the endpoint is down
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = CircuitBreaker("Grounding endpoint")
+        
         # Get actual screen resolution
         self.screen_width, self.screen_height = pyautogui.size()
         
         print(f"📐 Grounding Model Setup:")
         print(f"   Model resolution: {self.model_width}x{self.model_height}")
         print(f"   Screen resolution: {self.screen_width}x{self.screen_height}")
-        print(f"   Scale factor: X={self.screen_width/self.model_width:.2f}, Y={self.screen_height/self.model_height:.2f}")
     
-    def resize_coordinates(self, x: int, y: int) -> Tuple[int, int]:
-        """
-        Scale coordinates from model resolution to screen resolution.
-        
-        Args:
-            x, y: Coordinates in model's resolution (e.g., 1920x1080)
-            
-        Returns:
-            Scaled coordinates for actual screen
-        """
-        scaled_x = round(x * self.screen_width / self.model_width)
-        scaled_y = round(y * self.screen_height / self.model_height)
-        return scaled_x, scaled_y
-    
-    def find_coordinates(self, element_description: str) -> Tuple[int, int]:
+    def find_coordinates(self, element_description: str, frame: Optional[Frame] = None) -> Tuple[int, int]:
         """
         Find coordinates of a UI element from description.
         
         Args:
             element_description: Natural language description of what to find
+            frame: Frame to look at, e.g. the one the agent's step decided on
+                (defaults to a fresh capture)
             
         Returns:
             (x, y) coordinates scaled to your screen resolution
         """
-        # Take screenshot
-        screenshot = pyautogui.screenshot()
-        buffered = io.BytesIO()
-        screenshot.save(buffered, format="PNG")
-        screenshot_bytes = buffered.getvalue()
-        screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
-        
-        # Prepare prompt - TELL THE MODEL THE RESOLUTION
+        # Reuse the step's frame if there is one; standalone calls see the screen as it is now
+        frame = frame or self.frames.capture()
+        
+        # Upload at (at most) model resolution, not the native 4K/5K frame
+        upload_size = frame.fit_size((self.model_width, self.model_height))
+        if self.image_format == "auto":
+            encoded = frame.adaptive(upload_size, "grounding", jpeg_quality=self.image_quality)
+        else:
+            encoded = frame.encoded(upload_size, self.image_format, self.image_quality)
+        print(f"   Uploading {encoded.size[0]}x{encoded.size[1]} {encoded.format}, {encoded.num_bytes / 1024:.0f}KB")
+        
+        # Prepare prompt - TELL THE MODEL THE RESOLUTION (of what we actually send)
         prompt = f"""Query:{element_description}
 Output only the coordinate of one point in your response.
-The image resolution is {self.model_width}x{self.model_height}.
+The image resolution is {encoded.size[0]}x{encoded.size[1]}.
 """
         
         # Call grounding model
@@ -80,7 +93,8 @@ The image resolution is {self.model_width}x{self.model_height}.
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{screenshot_b64}"
+                                # Filled in chunk by chunk while the body is sent
+                                "url": IMAGE_PLACEHOLDER
                             }
                         }
                     ]
@@ -90,12 +104,23 @@ The image resolution is {self.model_width}x{self.model_height}.
             "temperature": 0.0
         }
         
-        response = requests.post(
-            f"{self.endpoint_url}/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
+        def post(cancelled=None):
+            # A body streams once, so every attempt builds its own
+            response = requests.post(
+                f"{self.endpoint_url}/v1/chat/completions",
+                headers=headers,
+                data=StreamingJSONBody(payload, encoded.data, encoded.media_type),
+                timeout=60
+            )
+            if response.status_code in RETRY_STATUSES:
+                response.raise_for_status()
+            return response
+        
+        def attempt(number: int):
+            # Retries reuse the upload encoded above
+            return self.breaker.call(lambda: self.hedger.call(post) if self.hedger else post())
+        
+        response = self.retry_policy.call(attempt, describe="Grounding attempt")
         
         if response.status_code == 200:
             result = response.json()
@@ -107,11 +132,11 @@ The image resolution is {self.model_width}x{self.model_height}.
             if len(numericals) >= 2:
                 model_x = int(numericals[0])
                 model_y = int(numericals[1])
-                print(f"   Model coordinates (in {self.model_width}x{self.model_height}): ({model_x}, {model_y})")
+                print(f"   Model coordinates (in {encoded.size[0]}x{encoded.size[1]}): ({model_x}, {model_y})")
                 
-                # Scale to actual screen resolution
-                screen_x, screen_y = self.resize_coordinates(model_x, model_y)
-                print(f"   Scaled coordinates (in {self.screen_width}x{self.screen_height}): ({screen_x}, {screen_y})")
+                # Scale from the uploaded image to the frame's region of the screen
+                screen_x, screen_y = frame.to_screen(model_x, model_y, encoded.size)
+                print(f"   Screen coordinates (region {frame.region}): ({screen_x}, {screen_y})")
                 
                 return screen_x, screen_y
         
@@ -129,6 +154,8 @@ class SmartActions(ComputerActions):
     def __init__(self, grounding_model: GroundingModel = None):
         super().__init__()
         self.grounding = grounding_model
+        # Frame of the agent step being executed (None: capture a fresh one)
+        self.frame: Optional[Frame] = None
     
     def click_element(self, description: str, button: str = 'left', clicks: int = 1) -> Dict:
         """
@@ -141,10 +168,13 @@ class SmartActions(ComputerActions):
             click_element("the LinkedIn message input box")
         """
         print(f"🔍 Finding: {description}")
-        x, y = self.grounding.find_coordinates(description)
+        x, y = self.grounding.find_coordinates(description, frame=self.frame)
         print(f"✅ Found at: ({x}, {y})")
         
-        return self.click(x, y, button=button, clicks=clicks)
+        result = self.click(x, y, button=button, clicks=clicks)
+        self.frame = None
+        self.grounding.frames.invalidate()
+        return result
     
     def type_in_element(self, description: str, text: str) -> Dict:
         """
@@ -0,0 +1,187 @@
+"""
+hedging.py - Hedged model requests against slow tail responses
+
+Most model calls come back in about the same time, but a few take several
+times longer, and those few set the p99 of a step. Hedger sends a request,
+and if no answer has arrived by a deadline taken from the recent latency
+distribution (the 90th percentile by default), sends the same request
+again. The first successful answer wins; the other attempt is cancelled.
+
+Cancelling means different things per transport: an asyncio attempt is a
+task and gets task.cancel(), which closes its connection; a threaded
+attempt gets a threading.Event it should check while reading (StepAgent
+streams hedged requests for this, and hangs up). A threaded attempt
+blocked in a plain request (grounding) can't be interrupted; it is
+abandoned and its answer dropped. Each threaded attempt runs on its own
+daemon thread, so abandoned attempts never hold up new ones.
+
+Every attempt's latency feeds the percentile, losers included (measured
+until they finish or hang up), so the deadline doesn't drift down to the
+fast answers only.
+
+Usage:
+    hedger = Hedger(percentile=0.9)
+    text = hedger.call(lambda cancelled: request(cancelled))
+    text = await hedger.acall(lambda: async_request())
+"""
+
+import asyncio
+import collections
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Awaitable, Callable, Deque
+
+from metrics import HedgeStats
+
+MIN_SAMPLES = 5   # Latencies needed before the percentile is trusted
+
+
+class Hedger:
+    """
+    Sends a second copy of a request once the first is slower than usual.
+    """
+
+    def __init__(self, percentile: float = 0.9, initial_delay: float = 5.0,
+                 min_delay: float = 0.25, window: int = 50):
+        """
+        Args:
+            percentile: Latency percentile (0-1) after which the hedge goes out
+            initial_delay: Deadline in seconds until MIN_SAMPLES latencies are known
+            min_delay: Shortest deadline, so fast endpoints aren't always hedged
+            window: Recent attempt latencies the percentile is taken over
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.stats = HedgeStats()
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def deadline(self) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        return max(self.min_delay, ordered[int(self.percentile * (len(ordered) - 1))])
+
+    def _observe(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def call(self, request: Callable[[threading.Event], Any]) -> Any:
+        """
+        Run request, hedged.
+
+        Args:
+            request: Makes one attempt; gets an Event that is set once the
+                attempt has lost and should stop reading
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            The last attempt's exception, if every attempt failed
+        """
+        start = time.perf_counter()
+        deadline = self.deadline()
+        attempts = {}
+
+        def launch(hedge: bool):
+            cancelled = threading.Event()
+            attempts[self._start(request, cancelled)] = (hedge, cancelled)
+
+        launch(False)
+        done, _ = wait(list(attempts), timeout=deadline)
+        if not done:
+            print(f"   🪁 No answer after {deadline:.2f}s, hedging the request")
+            launch(True)
+
+        error = None
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for other in pending:
+                    attempts[other][1].set()
+                self.stats.record(time.perf_counter() - start, hedged=len(attempts) > 1,
+                                  hedge_won=attempts[future][0])
+                return result
+        self.stats.record(time.perf_counter() - start, hedged=len(attempts) > 1, failed=True)
+        raise error
+
+    def _start(self, request: Callable[[threading.Event], Any], cancelled: threading.Event) -> Future:
+        """Run one attempt on a daemon thread of its own; its latency is observed when it ends."""
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+
+        def run():
+            start = time.perf_counter()
+            try:
+                result = request(cancelled)
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            self._observe(time.perf_counter() - start)
+            future.set_result(result)
+
+        threading.Thread(target=run, name="hedge", daemon=True).start()
+        return future
+
+    async def acall(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run request, hedged, on the event loop (see call()).
+
+        Args:
+            request: Makes one attempt when awaited; losing attempts are cancelled
+        """
+        start = time.perf_counter()
+        deadline = self.deadline()
+        attempts = {}
+
+        async def timed():
+            attempt_start = time.perf_counter()
+            try:
+                result = await request()
+            except asyncio.CancelledError:
+                # A loser's time so far still says how slow the endpoint is
+                self._observe(time.perf_counter() - attempt_start)
+                raise
+            self._observe(time.perf_counter() - attempt_start)
+            return result
+
+        def launch(hedge: bool):
+            attempts[asyncio.ensure_future(timed())] = hedge
+
+        launch(False)
+        done, _ = await asyncio.wait(list(attempts), timeout=deadline)
+        if not done:
+            print(f"   🪁 No answer after {deadline:.2f}s, hedging the request")
+            launch(True)
+
+        error = None
+        pending = set(attempts)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    self.stats.record(time.perf_counter() - start, hedged=len(attempts) > 1,
+                                      hedge_won=attempts[task])
+                    return result
+        finally:
+            # The loser, or both attempts if we were cancelled ourselves
+            for task in pending:
+                task.cancel()
+        self.stats.record(time.perf_counter() - start, hedged=len(attempts) > 1, failed=True)
+        raise error
@@ -0,0 +1,164 @@
+"""
+history.py - Token-budgeted step history for the step agent prompt
+
+The prompt shows the most recent steps verbatim (action, params, reasoning)
+and folds older ones into a compact summary: per-action counts, the last few
+distinct params of each action and the most recent failures. Each step is
+rendered once when it arrives and folded once when it ages out, so building
+the history text costs the same at step 50 as at step 5, and its size stays
+under the token budget.
+
+Usage:
+    history = StepHistory(token_budget=1200, recent_steps=6)
+    history.sync(agent.history)   # picks up steps appended since the last call
+    text = history.render()
+"""
+
+import collections
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+PARAM_CHARS = 40          # Longest param value kept in the summary
+PARAMS_PER_ACTION = 3     # Distinct recent params kept per action
+FAILURES_KEPT = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _status_mark(step: Dict[str, Any]) -> str:
+    return "✓" if step.get('status') == 'success' else "✗"
+
+
+def _short(value: Any) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= PARAM_CHARS else text[:PARAM_CHARS - 1] + "…"
+
+
+class StepHistory:
+    """
+    Verbatim recent steps plus an incrementally folded summary of older ones.
+    """
+
+    def __init__(self, token_budget: int = 1200, recent_steps: int = 6):
+        """
+        Args:
+            token_budget: Approximate token cap for the whole history text
+            recent_steps: Most steps shown verbatim (fewer if over budget)
+        """
+        self.token_budget = token_budget
+        self.recent_steps = recent_steps
+        self._source: Optional[List[Dict[str, Any]]] = None
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.folded = 0
+        # (step number, rendered line, tokens) for steps shown verbatim
+        self._recent: Deque[Tuple[int, str, int]] = collections.deque()
+        self._recent_tokens = 0
+        self._recent_steps: Deque[Dict[str, Any]] = collections.deque()
+        # Summary state: action -> [successes, failures], action -> recent params
+        self._counts: Dict[str, List[int]] = {}
+        self._params: Dict[str, Deque[str]] = {}
+        self._failures: Deque[str] = collections.deque(maxlen=FAILURES_KEPT)
+        self._summary = ""
+        self._summary_tokens = 0
+        self._last: Optional[Dict[str, Any]] = None
+
+    def sync(self, steps: List[Dict[str, Any]]):
+        """Add the steps appended to `steps` since the last sync."""
+        if steps is not self._source or len(steps) < self.count:
+            # A new run (or a rewritten history): start over
+            self._source = steps
+            self.reset()
+        for step in steps[self.count:]:
+            self.add(step)
+
+    def add(self, step: Dict[str, Any]):
+        """Append one step result."""
+        self.count += 1
+        line = self._render_step(self.count, step)
+        tokens = estimate_tokens(line)
+        self._recent.append((self.count, line, tokens))
+        self._recent_steps.append(step)
+        self._recent_tokens += tokens
+        self._last = step
+
+        # Age out the oldest verbatim steps into the summary
+        while len(self._recent) > 1 and (
+            len(self._recent) > self.recent_steps
+            or self._recent_tokens + self._summary_tokens > self.token_budget
+        ):
+            number, _, tokens = self._recent.popleft()
+            self._recent_tokens -= tokens
+            self._fold(number, self._recent_steps.popleft())
+
+    @staticmethod
+    def _render_step(number: int, step: Dict[str, Any]) -> str:
+        return (f"{number}. [{_status_mark(step)}] {step['action']}({step.get('params', {})})"
+                f" - {step.get('reasoning', '')}\n")
+
+    def _fold(self, number: int, step: Dict[str, Any]):
+        """Merge one step into the summary state and refresh the summary text."""
+        self.folded = number
+        action = step['action']
+        counts = self._counts.setdefault(action, [0, 0])
+        counts[0 if step.get('status') == 'success' else 1] += 1
+
+        params = step.get('params') or {}
+        if params:
+            shown = ", ".join(_short(v) for v in params.values())
+            recent = self._params.setdefault(action, collections.deque(maxlen=PARAMS_PER_ACTION))
+            if shown in recent:
+                recent.remove(shown)
+            recent.append(shown)
+
+        if step.get('status') != 'success':
+            self._failures.append(f"{number}. {action}: {_short(step.get('error', step.get('status', '')))}")
+
+        # Bounded by the number of distinct actions, not by the number of steps
+        parts = []
+        for name, (ok, failed) in self._counts.items():
+            part = f"{name} x{ok + failed}" + (f" ({failed} failed)" if failed else "")
+            if self._params.get(name):
+                part += ": " + "; ".join(self._params[name])
+            parts.append(part)
+        summary = f"Steps 1-{number} (summarized): " + " | ".join(parts) + "\n"
+        if self._failures:
+            summary += "Recent failures: " + " | ".join(self._failures) + "\n"
+        self._summary = summary
+        self._summary_tokens = estimate_tokens(summary)
+
+    def render(self, pending: Optional[Dict[str, Any]] = None) -> str:
+        """
+        The history section of the step prompt.
+
+        Args:
+            pending: A step to show as if it had already been added (for speculation)
+        """
+        lines = [line for _, line, _ in self._recent]
+        last = self._last
+        if pending is not None:
+            lines.append(self._render_step(self.count + 1, pending))
+            last = pending
+
+        if last is None:
+            return "No actions taken yet. This is the first action."
+
+        return (
+            "ACTIONS COMPLETED SO FAR:\n"
+            + self._summary
+            + "".join(lines)
+            + "\nDO NOT repeat these actions. Continue from where you left off.\n"
+            + f"\nLast action: {last['action']}({last['params']}) - {last['status']}\n"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "steps": self.count,
+            "summarized": self.folded,
+            "verbatim": len(self._recent),
+            "tokens": self._summary_tokens + self._recent_tokens,
+        }
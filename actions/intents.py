@@ -0,0 +1,184 @@
+"""
+intents.py - Local fast path for simple commands, no model involved
+
+"open chrome", "new tab", "scroll down" or "go to github.com" don't need a
+screenshot and a vision model call. match_intent() checks a command
+against a table of patterns, each mapping to one ComputerActions call with
+its params taken from the pattern's groups. Commands joined with "and" /
+"then" match if every part does ("open safari and go to github.com").
+
+Anything the table doesn't fully cover returns None, and the command goes
+to the model as before: a partial match is treated as no match, so the
+fast path only ever runs commands it understood completely. If one of the
+actions fails, the result is "incomplete" and its history says what
+already ran, so the model can pick up from there instead of repeating it.
+
+Usage:
+    result = run_intent("open safari and go to github.com")
+    if result is None or result['status'] != 'complete':
+        history = result['history'] if result else None
+        result = StepAgent(anthropic_api_key=key).run("open safari and go to github.com", history=history)
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from actions import ComputerActions
+from tool_schema import validate_params
+
+# Leading/trailing filler that doesn't change the command
+_POLITE = re.compile(r"^(?:(?:hey\s+)?jarvis[,\s]+)?(?:(?:please|can you|could you|would you)\s+)*|"
+                     r"(?:[,\s]+please)?[.!?\s]*$", re.IGNORECASE)
+_SPLIT = re.compile(r"\s*(?:,\s*)?\b(?:and then|and|then)\b\s*", re.IGNORECASE)
+
+_URL = r"(?P<url>(?:https?://)?[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}(?:[/?#]\S*)?)"
+# One to three words; only KNOWN_APPS are opened, anything else goes to the model
+_APP = r"(?P<app>(?!(?:a|the|my|new|up|down)\b)[\w+]+(?:[ .][\w+]+){0,2}?)"
+_AMOUNT = r"(?:\s+(?:by\s+)?(?P<amount>\d+)(?:\s+(?:times|clicks|lines|notches))?)?"
+
+# Apps the fast path opens by name. "open it", "open google docs" or "run tests"
+# name something else (a file, a web app, a task), and open_app can't tell
+# it failed, so every other target is left to the model.
+KNOWN_APPS = {"chrome", "google chrome", "safari", "firefox", "edge", "microsoft edge", "brave", "arc",
+              "finder", "terminal", "iterm", "notes", "mail", "messages", "calendar", "music",
+              "spotify", "slack", "discord", "zoom", "teams", "vscode", "vs code", "visual studio code",
+              "word", "excel", "powerpoint", "outlook", "notion", "obsidian", "preview", "photos",
+              "system settings", "system preferences", "settings", "calculator", "textedit"}
+
+KEYS = {"enter", "return", "escape", "esc", "tab", "space", "backspace", "delete",
+        "up", "down", "left", "right", "home", "end", "pageup", "pagedown"}
+SCROLL_CLICKS = 5  # "scroll down" without an amount
+
+
+def _scroll(sign: int) -> Callable[[Dict[str, str]], Dict[str, Any]]:
+    return lambda groups: {"clicks": sign * int(groups.get("amount") or SCROLL_CLICKS)}
+
+
+def _press(groups: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    key = groups["key"].lower().replace(" ", "")
+    return {"key": key} if key in KEYS else None
+
+
+def _url(groups: Dict[str, str]) -> Dict[str, Any]:
+    return {"url": groups["url"]}
+
+
+def _known_app(groups: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    return {"app_name": groups["app"]} if groups["app"].lower() in KNOWN_APPS else None
+
+
+# (pattern, action, params from the match's groups; None params = not a match).
+# Checked in order, first full match wins, so specific patterns come first.
+INTENT_RULES: List[Tuple[str, str, Callable[[Dict[str, str]], Optional[Dict[str, Any]]]]] = [
+    (r"(?:open|start)\s+(?:a\s+)?new\s+tab|new\s+tab", "new_tab", lambda g: {}),
+    (r"close\s+(?:this\s+|the\s+|current\s+)?tab", "close_tab", lambda g: {}),
+    (r"close\s+(?:this\s+|the\s+|current\s+)?window", "close_window", lambda g: {}),
+    (r"(?:switch|change)\s+(?:to\s+(?:the\s+)?next\s+)?windows?", "switch_window", lambda g: {}),
+    (r"(?:go|navigate|browse)\s+to\s+" + _URL, "open_url", _url),
+    (r"(?:open|visit|load)\s+" + _URL, "open_url", _url),
+    (r"(?:open|launch|start|run)\s+" + _APP + r"(?:\s+app(?:lication)?)?", "open_app", _known_app),
+    (r"scroll\s+down" + _AMOUNT, "scroll", _scroll(-1)),
+    (r"scroll\s+up" + _AMOUNT, "scroll", _scroll(1)),
+    (r"(?:go\s+)?back(?:\s+a\s+page)?", "go_back", lambda g: {}),
+    (r"(?:go\s+)?forward(?:\s+a\s+page)?", "go_forward", lambda g: {}),
+    (r"(?:refresh|reload)(?:\s+(?:the\s+|this\s+)?page)?", "refresh_page", lambda g: {}),
+    (r"select\s+all", "select_all", lambda g: {}),
+    (r"copy(?:\s+(?:that|it|this))?", "copy", lambda g: {}),
+    (r"paste(?:\s+(?:that|it|this))?", "paste", lambda g: {}),
+    (r"cut(?:\s+(?:that|it|this))?", "cut", lambda g: {}),
+    (r"undo(?:\s+(?:that|it|this))?", "undo", lambda g: {}),
+    (r"redo(?:\s+(?:that|it|this))?", "redo", lambda g: {}),
+    (r"save(?:\s+(?:the\s+|this\s+)?file)?", "save", lambda g: {}),
+    (r"press\s+(?:the\s+)?(?P<key>[a-z ]+?)(?:\s+key)?", "press_key", _press),
+    (r"type\s+(?P<quote>[\"'])(?P<text>.+)(?P=quote)", "type_text", lambda g: {"text": g["text"]}),
+    (r"wait(?:\s+(?:for\s+)?(?P<seconds>\d+(?:\.\d+)?)\s+seconds?)?", "wait",
+     lambda g: {"seconds": float(g.get("seconds") or 1)}),
+]
+
+_COMPILED: List[Tuple[Pattern, str, Callable]] = [
+    (re.compile(pattern, re.IGNORECASE), action, params) for pattern, action, params in INTENT_RULES
+]
+
+
+def _match_one(command: str) -> Optional[Dict[str, Any]]:
+    for pattern, action, build in _COMPILED:
+        match = pattern.fullmatch(command)
+        if match:
+            params = build({k: v for k, v in match.groupdict().items() if v is not None})
+            if params is None:
+                return None
+            return {"action": action, "params": params, "reasoning": f"Local intent: '{command}'"}
+    return None
+
+
+def match_intent(instruction: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Actions for an instruction, if the rule table covers all of it.
+
+    Args:
+        instruction: What the user said
+
+    Returns:
+        List of action dicts ('action', 'params', 'reasoning'), or None when unsure
+    """
+    command = _POLITE.sub("", instruction.strip())
+    # Quoted text is typed as-is, so don't split inside it
+    quoted = '"' in command or "'" in command
+    if not command or (quoted and not re.fullmatch(r"type\s+([\"']).+\1", command, re.IGNORECASE)):
+        return None
+    parts = [command] if command.lower().startswith("type ") else _SPLIT.split(command)
+
+    actions = []
+    for part in parts:
+        action_dict = _match_one(part.strip())
+        if action_dict is None:
+            return None
+        actions.append(action_dict)
+    return actions
+
+
+def run_intent(instruction: str, actions: Optional[ComputerActions] = None) -> Optional[Dict[str, Any]]:
+    """
+    Run an instruction through the local fast path.
+
+    Args:
+        instruction: What the user said
+        actions: ComputerActions to run with (a new one if not given)
+
+    Returns:
+        Result in StepAgent.run's shape (decisions == 0), or None if the
+        instruction isn't a simple command. The status is "incomplete" if an
+        action failed; its history holds the steps that ran, the failed one last
+    """
+    planned = match_intent(instruction)
+    if planned is None:
+        return None
+
+    actions = actions or ComputerActions()
+    print(f"⚡ Local intent: {' → '.join(a['action'] for a in planned)}")
+    history = []
+    status = "complete"
+    for action_dict in planned:
+        method = getattr(actions, action_dict['action'])
+        try:
+            params = validate_params(method, action_dict['params'])
+            result = method(**params)
+        except Exception as e:
+            print(f"   ❌ {action_dict['action']} failed: {e}; handing the command to the model")
+            history.append(dict(action_dict, error=str(e), status="failed"))
+            status = "incomplete"
+            break
+        history.append(dict(action_dict, result=result, status=result.get('status', 'success')))
+        if history[-1]['status'] != 'success':
+            print(f"   ❌ {action_dict['action']} failed; handing the command to the model")
+            status = "incomplete"
+            break
+
+    return {
+        "status": status,
+        "goal": instruction,
+        "history": history,
+        "handoff": None,
+        "decisions": 0,
+        "intent": [a['action'] for a in planned],
+    }
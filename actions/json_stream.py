@@ -0,0 +1,75 @@
+"""
+json_stream.py - Find the first complete JSON object in streamed text
+
+Feed text chunks as they arrive from the model; feed() returns the object's
+text as soon as its closing brace shows up, so the caller can stop reading
+the rest of the response.
+
+Usage:
+    scanner = JSONObjectScanner()
+    for chunk in stream.text_stream:
+        obj = scanner.feed(chunk)
+        if obj is not None:
+            break
+"""
+
+from typing import Optional
+
+
+class JSONObjectScanner:
+    """
+    Tracks brace depth (ignoring braces inside strings) across chunks.
+
+    Anything before the first '{' (prose, a ```json fence) is skipped.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.complete = None  # Text of the finished object, once found
+
+    @property
+    def text(self) -> str:
+        """Object text collected so far (possibly incomplete)."""
+        return "".join(self._buffer)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Consume one chunk.
+
+        Returns:
+            The complete top-level object text, or None if it hasn't closed yet
+        """
+        if self.complete is not None:
+            return self.complete
+
+        start = 0
+        if self._depth == 0:
+            start = chunk.find("{")
+            if start < 0:
+                return None
+
+        for i in range(start, len(chunk)):
+            ch = chunk[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(chunk[start:i + 1])
+                    self.complete = self.text
+                    return self.complete
+
+        self._buffer.append(chunk[start:])
+        return None
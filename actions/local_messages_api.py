@@ -0,0 +1,311 @@
+"""
+local_messages_api.py - Local stand-in for the Anthropic messages API
+
+Lets you run StepAgent end to end without a real endpoint, and see what the
+agent sends. It emulates prompt caching: prefixes ending at cache_control blocks are
+written, and later requests read the longest written prefix they share.
+
+Usage:
+    python local_messages_api.py --port 8080
+    python local_messages_api.py --port 8080 --responses replies.txt --delay 0.5
+    python local_messages_api.py --port 8080 --chunk-delay 0.05   # slow streamed output
+    python local_messages_api.py --port 8080 --slow-every 5 --slow-delay 3   # a slow tail
+
+Then point the agent at it:
+    StepAgent(anthropic_api_key="test", anthropic_base_url="http://127.0.0.1:8080")
+
+replies.txt has one response text per line, used in order and then cycled.
+Requests with tools get the reply as a tool call (see _tool_use).
+Requests with "stream": true get server-sent events like the real API, one
+CHUNK_CHARS-sized text (or tool input) delta every chunk_delay seconds; the server notices
+when the client hangs up early and stops sending.
+
+A duplicate of a request that is still being answered (a hedge) gets the
+same reply as the original instead of the next one. With slow_every, every Nth request
+takes slow_delay seconds longer, for hedging experiments.
+
+POST /v1/chat/completions answers like the grounding endpoint, with
+GROUNDING_REPLY as the point.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+DONE_REPLY = '{"action": "done", "params": {}, "reasoning": "local stand-in"}'
+IMAGE_TOKENS = 1500  # Rough cost of one screenshot
+CHUNK_CHARS = 8     # Text per streamed delta, roughly a couple of tokens
+GROUNDING_REPLY = "(960,540)"
+
+
+def _estimate_tokens(block: Any) -> int:
+    if isinstance(block, dict) and block.get("type") == "image":
+        return IMAGE_TOKENS
+    return max(1, len(json.dumps(block)) // 4)
+
+
+def _flatten(request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """All prompt blocks in cache order: tools, system, then messages."""
+    blocks = list(request.get("tools") or [])
+    system = request.get("system") or []
+    blocks += [{"type": "text", "text": system}] if isinstance(system, str) else list(system)
+    for message in request.get("messages", []):
+        content = message.get("content")
+        blocks += [{"type": "text", "text": content}] if isinstance(content, str) else list(content)
+    return blocks
+
+
+def _tool_use(request: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """
+    Turn a canned JSON reply into a tool call: {"action": name, "params": ...}
+    calls that action's tool, anything else becomes the input of the forced
+    (or first) tool.
+    """
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        reply = {"text": text}
+    names = [tool["name"] for tool in request["tools"]]
+    choice = request.get("tool_choice") or {}
+
+    if reply.get("action") in names:
+        name = reply["action"]
+        tool_input = dict(reply.get("params") or {}, reasoning=reply.get("reasoning", ""))
+    else:
+        name = choice.get("name") or names[0]
+        tool_input = reply
+    return {"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": name, "input": tool_input}
+
+
+class StandInState:
+    def __init__(self, replies: List[str], delay: float, chunk_delay: float = 0.0,
+                 slow_every: int = 0, slow_delay: float = 0.0):
+        self._replies = itertools.cycle(replies or [DONE_REPLY])
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.slow_every = slow_every
+        self.slow_delay = slow_delay
+        self.cache = set()
+        self.in_flight: Dict[str, List] = {}  # Request digest -> [reply, open requests]
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.duplicates = 0         # Requests that got an in-flight duplicate's reply
+        self.cancelled_streams = 0  # Streams the client closed before message_stop
+
+    def next_reply(self, request: Dict[str, Any]) -> Tuple[str, str]:
+        """(request digest, reply text); call finished(digest) once answered."""
+        key = hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+        with self.lock:
+            self.requests += 1
+            if key in self.in_flight:
+                self.duplicates += 1
+                self.in_flight[key][1] += 1
+            else:
+                self.in_flight[key] = [next(self._replies), 1]
+            return key, self.in_flight[key][0]
+
+    def finished(self, key: str):
+        with self.lock:
+            entry = self.in_flight[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self.in_flight[key]
+
+    def response_delay(self) -> float:
+        """Seconds to hold the request that was just counted."""
+        with self.lock:
+            slow = self.slow_every and self.requests % self.slow_every == 0
+        return self.delay + (self.slow_delay if slow else 0.0)
+
+    def usage(self, request: Dict[str, Any]) -> Tuple[int, int, int]:
+        """
+        (cache_read, cache_write, uncached) input tokens for a request.
+
+        Like the real API, a request reads the longest previously written
+        prefix that ends at any block boundary up to its last breakpoint,
+        and writes a cache entry at each of its breakpoints.
+        """
+        blocks = _flatten(request)
+        cut = max((i + 1 for i, b in enumerate(blocks) if isinstance(b, dict) and b.get("cache_control")), default=0)
+        tokens = [_estimate_tokens(b) for b in blocks]
+        if not cut:
+            return 0, 0, sum(tokens)
+
+        # Prefix digests at every block boundary, ignoring where breakpoints sit
+        hasher = hashlib.sha256()
+        digests = []
+        for block in blocks[:cut]:
+            if isinstance(block, dict):
+                block = {k: v for k, v in block.items() if k != "cache_control"}
+            hasher.update(json.dumps(block, sort_keys=True).encode())
+            digests.append(hasher.hexdigest())
+
+        with self.lock:
+            hit = max((i + 1 for i, d in enumerate(digests) if d in self.cache), default=0)
+            self.cache.update(d for d, b in zip(digests, blocks) if isinstance(b, dict) and b.get("cache_control"))
+        read = sum(tokens[:hit])
+        written = sum(tokens[hit:cut])
+        return read, written, sum(tokens[cut:])
+
+
+def make_handler(state: StandInState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            path = self.path.rstrip("/")
+            if not path.endswith(("/v1/messages", "/v1/chat/completions")):
+                self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if path.endswith("/v1/chat/completions"):
+                with state.lock:
+                    state.requests += 1
+                time.sleep(state.response_delay())
+                self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": GROUNDING_REPLY}}]})
+                return
+
+            key, text = state.next_reply(request)
+            try:
+                self._answer(request, text, state.response_delay())
+            finally:
+                state.finished(key)
+
+        def _answer(self, request: Dict[str, Any], text: str, delay: float):
+            if delay:
+                time.sleep(delay)
+
+            cache_read, cache_write, uncached = state.usage(request)
+            message = {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": request.get("model", "stand-in"),
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {
+                    "input_tokens": uncached,
+                    "output_tokens": max(1, len(text) // 4),
+                    "cache_creation_input_tokens": cache_write,
+                    "cache_read_input_tokens": cache_read,
+                },
+            }
+
+            if request.get("tools"):
+                message["content"] = [_tool_use(request, text)]
+                message["stop_reason"] = "tool_use"
+
+            if not request.get("stream"):
+                try:
+                    self._send_json(200, message)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up on it (a hedge that lost)
+                return
+
+            try:
+                self._send_stream(message)
+            except (BrokenPipeError, ConnectionResetError):
+                with state.lock:
+                    state.cancelled_streams += 1
+
+        def _send_stream(self, message: Dict[str, Any]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            block = message["content"][0]
+            if block["type"] == "tool_use":
+                # Tool input streams as partial JSON, like the real API
+                text = json.dumps(block["input"])
+                start_block, delta_type, delta_key = dict(block, input={}), "input_json_delta", "partial_json"
+            else:
+                text = block["text"]
+                start_block, delta_type, delta_key = {"type": "text", "text": ""}, "text_delta", "text"
+            self._send_event("message_start", {
+                "type": "message_start",
+                "message": dict(message, content=[], stop_reason=None,
+                                usage=dict(message["usage"], output_tokens=1)),
+            })
+            self._send_event("content_block_start", {
+                "type": "content_block_start", "index": 0, "content_block": start_block,
+            })
+            for start in range(0, len(text), CHUNK_CHARS):
+                if state.chunk_delay:
+                    time.sleep(state.chunk_delay)
+                self._send_event("content_block_delta", {
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": delta_type, delta_key: text[start:start + CHUNK_CHARS]},
+                })
+            self._send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+            self._send_event("message_delta", {
+                "type": "message_delta",
+                "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                "usage": {"output_tokens": message["usage"]["output_tokens"]},
+            })
+            self._send_event("message_stop", {"type": "message_stop"})
+
+        def _send_event(self, event: str, data: Dict[str, Any]):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def _send_json(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port: int = 8080, replies: List[str] = None, delay: float = 0.0,
+          chunk_delay: float = 0.0, slow_every: int = 0, slow_delay: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread and return the server."""
+    state = StandInState(replies, delay, chunk_delay, slow_every, slow_delay)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.state = state  # Request/cancel counters, for tests
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic messages API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--responses", help="File with one response text per line")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed text deltas")
+    parser.add_argument("--slow-every", type=int, default=0, help="Make every Nth request slow")
+    parser.add_argument("--slow-delay", type=float, default=0.0, help="Extra seconds for slow requests")
+    args = parser.parse_args()
+
+    replies = None
+    if args.responses:
+        with open(args.responses) as f:
+            replies = [line.rstrip("\n") for line in f if line.strip()]
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(
+        StandInState(replies, args.delay, args.chunk_delay, args.slow_every, args.slow_delay)))
+    print(f"🧪 Local messages API on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠️ Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+metrics.py - Per-run counters for the step agent
+
+Small, thread-safe stat holders that StepAgent fills in while it runs and
+returns (as plain dicts) in its result.
+"""
+
+import threading
+from typing import Any, Dict
+
+
+class CacheStats:
+    """
+    Provider-side prompt cache usage, from each response's usage block.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.hits = 0          # Requests that read a cached prefix
+        self.writes = 0        # Requests that (re)wrote the cache
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+        self.uncached_input_tokens = 0
+
+    def record(self, usage: Any):
+        """Record the usage object of one messages API response."""
+        if usage is None:
+            return
+        read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        written = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        uncached = getattr(usage, 'input_tokens', 0) or 0
+
+        with self._lock:
+            self.requests += 1
+            self.hits += 1 if read else 0
+            self.writes += 1 if written else 0
+            self.cache_read_tokens += read
+            self.cache_write_tokens += written
+            self.uncached_input_tokens += uncached
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            total_input = self.cache_read_tokens + self.cache_write_tokens + self.uncached_input_tokens
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "misses": self.requests - self.hits,
+                "hit_rate": round(self.hits / self.requests, 3) if self.requests else 0.0,
+                "cache_read_tokens": self.cache_read_tokens,
+                "cache_write_tokens": self.cache_write_tokens,
+                "uncached_input_tokens": self.uncached_input_tokens,
+                "cached_fraction": round(self.cache_read_tokens / total_input, 3) if total_input else 0.0,
+            }
+
+
+class SpeculationStats:
+    """
+    How often a decision requested during an action could be used as-is.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.attempts = 0
+        self.hits = 0
+        self.misses: Dict[str, int] = {}   # Reason -> count
+        self.saved_seconds = 0.0           # Model time overlapped with actions on hits
+
+    def hit(self, saved_seconds: float):
+        with self._lock:
+            self.attempts += 1
+            self.hits += 1
+            self.saved_seconds += max(0.0, saved_seconds)
+
+    def miss(self, reason: str):
+        with self._lock:
+            self.attempts += 1
+            self.misses[reason] = self.misses.get(reason, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.attempts, 3) if self.attempts else 0.0,
+                "misses": dict(self.misses),
+                "saved_seconds": round(self.saved_seconds, 3),
+                "avg_saved_per_hit": round(self.saved_seconds / self.hits, 3) if self.hits else 0.0,
+            }
+
+
+class TierStats:
+    """
+    Per-model-tier request latency, and how often the fast tier escalated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latencies: Dict[str, list] = {}   # Tier -> request seconds
+        self.decisions = 0                      # Decisions routed between tiers
+        self.escalated_decisions = 0            # ... of which ended up on the strong tier
+        self.escalations: Dict[str, int] = {}  # Reason -> count (click refinement included)
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            self.latencies.setdefault(tier, []).append(seconds)
+
+    def routed(self):
+        with self._lock:
+            self.decisions += 1
+
+    def escalated(self, reason: str, decision: bool = True):
+        with self._lock:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+            if decision:
+                self.escalated_decisions += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {}
+            for tier, times in self.latencies.items():
+                ordered = sorted(times)
+                tiers[tier] = {
+                    "requests": len(times),
+                    "avg_seconds": round(sum(times) / len(times), 3),
+                    "p50_seconds": round(ordered[len(ordered) // 2], 3),
+                    "max_seconds": round(ordered[-1], 3),
+                }
+            return {
+                "tiers": tiers,
+                "escalations": dict(self.escalations),
+                "escalation_rate": round(self.escalated_decisions / self.decisions, 3) if self.decisions else 0.0,
+            }
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return round(ordered[int(fraction * (len(ordered) - 1))], 3) if ordered else 0.0
+
+
+class HedgeStats:
+    """
+    How often requests were hedged, which attempt won, and end-to-end latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.hedged = 0        # Requests that sent a second attempt
+        self.hedge_wins = 0    # ... where the second attempt answered first
+        self.failed = 0
+        self.latencies: list = []          # End-to-end seconds, all requests
+        self.hedged_latencies: list = []   # End-to-end seconds, hedged requests
+
+    def record(self, seconds: float, hedged: bool, hedge_won: bool = False, failed: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+            if hedged:
+                self.hedged += 1
+                self.hedged_latencies.append(seconds)
+            if hedge_won:
+                self.hedge_wins += 1
+            if failed:
+                self.failed += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self.latencies)
+            hedged = sorted(self.hedged_latencies)
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": round(self.hedged / self.requests, 3) if self.requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "failed": self.failed,
+                "p50_seconds": _percentile(ordered, 0.5),
+                "p99_seconds": _percentile(ordered, 0.99),
+                "hedged_p50_seconds": _percentile(hedged, 0.5),
+            }
+
+
+class DecisionCacheStats:
+    """
+    Decision cache lookups, and what happened to its entries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0    # LRU evictions beyond max_entries
+        self.expirations = 0  # Entries found past their TTL
+        self.forgets = 0      # Entries dropped because their action failed
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stored(self):
+        with self._lock:
+            self.stores += 1
+
+    def evicted(self):
+        with self._lock:
+            self.evictions += 1
+
+    def expired(self):
+        with self._lock:
+            self.expirations += 1
+
+    def forgot(self):
+        with self._lock:
+            self.forgets += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "forgotten": self.forgets,
+            }
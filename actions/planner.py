@@ -0,0 +1,246 @@
+"""
+planner.py - Plan once, verify locally, re-plan only on failure
+
+PlanningAgent asks Claude for the whole action sequence up front, each
+action with optional local checks ("the screen changes", "the focused
+window's title contains Safari"). It then runs the plan with the normal
+StepAgent action/handoff machinery and only checks the screen locally
+between actions. A model call happens again only when a check fails, an
+action fails, or the plan runs out before "done".
+
+For routine commands that turns one vision call per action into one or
+two per command.
+
+Usage:
+    agent = PlanningAgent(anthropic_api_key=key)
+    result = agent.run("open safari and go to github.com")
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from capture import active_window_title
+from encoding import codec_stats
+from frames import Frame
+from step_agent import StepAgent
+
+PLAN_INSTRUCTIONS = """You plan ALL the actions needed to reach the goal, up front.
+
+YOUR JOB:
+1. Look at the current screenshot
+2. Consider the goal and what's been done so far
+3. Write the full sequence of actions that accomplishes the goal
+4. For each action, say how to check on this computer that it worked
+
+OUTPUT FORMAT:
+{
+  "plan": [
+    {"action": "open_app", "params": {"app_name": "Safari"}, "expect": {"window_title": "Safari"}},
+    {"action": "open_url", "params": {"url": "github.com"}, "expect": {"screen_changes": true}},
+    {"action": "done", "params": {}}
+  ],
+  "reasoning": "why this plan"
+}
+
+CHECKS ("expect", all optional):
+- "screen_changes": true if the action visibly changes the screen, false if it must not
+- "window_title": text the focused window's title or app name contains afterwards
+
+RULES:
+- Output ONLY valid JSON, nothing else
+- End the plan with "done" once it accomplishes the goal
+- Only add checks you are sure about; a failed check means a new plan
+- Use wait() after actions that change the UI (1-3 seconds)
+- When asked to re-plan, plan only the remaining actions, starting from the current screen"""
+
+CHANGE_THRESHOLD = 0.002  # Share of the screen that must differ to count as a change
+
+
+class PlanningAgent(StepAgent):
+    """
+    StepAgent that plans the whole goal in one call and verifies locally.
+    """
+
+    def __init__(self, anthropic_api_key: str, verify_timeout: float = 3.0,
+                 max_replans: int = 2, **kwargs):
+        """
+        Args:
+            anthropic_api_key: Anthropic API key
+            verify_timeout: Seconds to wait for a step's checks to pass
+            max_replans: New plans allowed after the first before giving up
+            **kwargs: Passed to StepAgent (grounding_model, roi, streaming, ...)
+        """
+        super().__init__(anthropic_api_key, **kwargs)
+        self.verify_timeout = verify_timeout
+        self.max_replans = max_replans
+
+    def _build_system_prompt(self) -> List[Dict[str, Any]]:
+        return [self._catalog_block(), self._cached_text(PLAN_INSTRUCTIONS)]
+
+    def plan(self, goal: str, failure: Optional[str] = None,
+             observation: Optional[Tuple[Frame, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Ask Claude for the actions that reach the goal from the current screen.
+
+        Args:
+            goal: The overall goal
+            failure: Why the previous plan was abandoned, when re-planning
+            observation: (frame, encoding) to plan on instead of a new screenshot
+
+        Returns:
+            List of action dicts ('action', 'params', 'expect', 'reasoning')
+        """
+        context = self._history_context()
+        text = f"Goal: {goal}\n\n{context}\n"
+        if failure:
+            text += f"\nTHE PREVIOUS PLAN FAILED: {failure}\nRe-plan from the current screen.\n"
+        text += "\nWrite the plan of actions for this goal."
+
+        frame, encoded = self._last_observation = observation or self._screenshot()
+        messages = [{
+            "role": "user",
+            "content": [{"type": "text", "text": text}, self._image_block(encoded)]
+        }]
+
+        print("🗺️  Asking Claude for a plan..." if not failure else "🗺️  Re-planning...")
+        self._count_decision()
+        plan_dict = self._parse_action(self._request_decision(messages, max_tokens=1500), frame=frame)
+
+        steps = []
+        for entry in plan_dict.get('plan') or []:
+            self._map_coordinates(entry, frame)
+            steps.append({
+                "action": entry['action'],
+                "params": entry.get('params', {}),
+                "expect": entry.get('expect') or {},
+                "reasoning": entry.get('reasoning') or plan_dict.get('reasoning', '')
+            })
+        print(f"   Plan: {' → '.join(s['action'] for s in steps) or '(empty)'}")
+        return steps
+
+    def verify(self, step: Dict[str, Any], before: Frame) -> Tuple[bool, str]:
+        """
+        Check a step's expectations locally, polling until verify_timeout.
+
+        Args:
+            step: The executed plan step
+            before: Frame from before the step ran
+
+        Returns:
+            (passed, what went wrong)
+        """
+        expect = step.get('expect') or {}
+        if not expect:
+            return True, ""
+
+        deadline = time.monotonic() + self.verify_timeout
+        while True:
+            problems = []
+            if 'screen_changes' in expect:
+                changed = self.frames.capture().changed_fraction(before) > CHANGE_THRESHOLD
+                if changed != bool(expect['screen_changes']):
+                    problems.append("the screen changed" if changed else "the screen did not change")
+            if expect.get('window_title'):
+                title = active_window_title()
+                # No title available here: nothing to check against
+                if title is not None and expect['window_title'].lower() not in title.lower():
+                    problems.append(f"focused window is '{title}', expected '{expect['window_title']}'")
+
+            if not problems:
+                print(f"   🔎 Verified: {json.dumps(expect)}")
+                return True, ""
+            if time.monotonic() >= deadline:
+                return False, f"after {step['action']}({step['params']}): " + "; ".join(problems)
+            time.sleep(0.25)
+
+    def run(self, goal: str, max_steps: int = 20,
+            history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Plan the goal, execute the plan, re-plan when a check fails.
+
+        Args:
+            goal: Goal to accomplish
+            max_steps: Maximum number of executed actions
+            history: Steps already taken toward the goal (e.g. by run_intent)
+
+        Returns:
+            Dictionary with status and history (same shape as StepAgent.run)
+        """
+        print("=" * 60)
+        print(f"🎯 GOAL (plan mode): {goal}")
+        print("=" * 60)
+
+        self.history = list(history or [])
+        self.cache_stats.reset()
+        codec_stats.reset()
+        self.tier_stats.reset()
+        self.retry_policy.retries = 0
+        if self.hedger:
+            self.hedger.stats.reset()
+        self.decisions = 0
+        handoff_info = None
+        error = None
+        replans = 0
+        plan: Optional[List[Dict[str, Any]]] = None
+        failure = None
+        step = 0
+
+        while step < max_steps:
+            if not plan:
+                if plan is not None:
+                    failure = failure or "the plan ended before the goal was done"
+                    replans += 1
+                    if replans > self.max_replans:
+                        print(f"⚠️  Giving up after {self.max_replans} re-plans: {failure}")
+                        break
+                try:
+                    plan = self._plan_with_retries(goal, failure)
+                except Exception as e:
+                    print(f"🛑 Stopping: {e}")
+                    error = str(e)
+                    break
+                failure = None
+                if not plan:
+                    print("⚠️  Could not get a plan, stopping")
+                    break
+
+            step += 1
+            print(f"\n{'='*60}")
+            print(f"STEP {step}/{max_steps} (plan: {len(plan)} left)")
+            print(f"{'='*60}")
+
+            action = plan.pop(0)
+            before = self.frames.current()
+            result = self.execute_action(action)
+            self.history.append(result)
+
+            stop, handoff_info = self._check_result(result, goal)
+            if stop:
+                break
+
+            if result['status'] != 'success':
+                failure = f"{action['action']}({action['params']}) failed: {result.get('error', result['status'])}"
+            else:
+                passed, failure = self.verify(action, before)
+                failure = None if passed else failure
+            if failure:
+                print(f"   ❌ Check failed: {failure}")
+                plan = []  # Triggers a re-plan
+
+        if step >= max_steps and error is None:
+            print("\n" + "=" * 60)
+            print("⚠️  Reached max steps")
+            print("=" * 60)
+
+        result = self._summarize(goal, handoff_info, error)
+        result["replans"] = replans
+        return result
+
+    def _plan_with_retries(self, goal: str, failure: Optional[str]) -> List[Dict[str, Any]]:
+        # A retry re-plans on the same, already encoded frame (a fresh one if
+        # the first attempt failed before capturing)
+        self._last_observation = None
+        return self.retry_policy.call(
+            lambda attempt: self.plan(goal, failure, None if attempt == 1 else self._last_observation),
+            describe="Planning attempt")
@@ -0,0 +1,79 @@
+"""
+request_body.py - Stream a JSON request with an embedded base64 image
+
+requests.post(json=payload) with a base64 data URL inside builds the image
+bytes, then the base64 string, then the serialized JSON body: three multi-MB
+copies per call. StreamingJSONBody serializes only the small JSON envelope
+and base64-encodes the image chunk by chunk while the body is being sent.
+
+Usage:
+    body = StreamingJSONBody(payload, image_bytes, "image/png")
+    requests.post(url, data=body, headers={"Content-Type": "application/json"})
+
+where payload contains IMAGE_PLACEHOLDER exactly once, in place of the
+data URL string.
+"""
+
+import base64
+import json
+from typing import Any, Dict, Iterator
+
+IMAGE_PLACEHOLDER = "__STREAMED_IMAGE_DATA_URL__"
+
+# Multiple of 3 so every chunk base64-encodes without padding
+_RAW_CHUNK = 3 * 16 * 1024
+
+
+class StreamingJSONBody:
+    """
+    File-like, sized request body: JSON envelope + streamed base64 image.
+
+    requests sees __len__ and sends a Content-Length header, then reads the
+    body in blocks; nothing bigger than one chunk is ever materialized.
+    Each instance can be sent once; build a new one per attempt.
+    """
+
+    def __init__(self, payload: Dict[str, Any], image: bytes, media_type: str):
+        envelope = json.dumps(payload)
+        if envelope.count(json.dumps(IMAGE_PLACEHOLDER)) != 1:
+            raise ValueError("payload must contain IMAGE_PLACEHOLDER exactly once")
+
+        prefix, suffix = envelope.split(json.dumps(IMAGE_PLACEHOLDER))
+        self._prefix = (prefix + f'"data:{media_type};base64,').encode('utf-8')
+        self._suffix = ('"' + suffix).encode('utf-8')
+        self._image = memoryview(image)
+
+        encoded_length = 4 * ((len(image) + 2) // 3)
+        self._length = len(self._prefix) + encoded_length + len(self._suffix)
+
+        self._chunks = self._generate()
+        self._pending = b""
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _generate(self) -> Iterator[bytes]:
+        yield self._prefix
+        for start in range(0, len(self._image), _RAW_CHUNK):
+            yield base64.b64encode(self._image[start:start + _RAW_CHUNK])
+        yield self._suffix
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._pending:
+            yield self._pending
+            self._pending = b""
+        yield from self._chunks
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b"".join(self)
+
+        out = bytearray(self._pending)
+        while len(out) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            out += chunk
+
+        self._pending = bytes(out[size:])
+        return bytes(out[:size])
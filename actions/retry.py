@@ -0,0 +1,230 @@
+"""
+retry.py - Retry policy and circuit breaker for model endpoints
+
+RetryPolicy retries a call with exponential backoff and full jitter, and
+waits at least as long as a 429/503 response's Retry-After asks. Errors
+that can't get better by retrying (bad request, auth) are raised at once.
+
+CircuitBreaker counts consecutive endpoint failures (connection errors,
+timeouts, 429/5xx). After failure_threshold of them it opens: calls fail
+immediately with CircuitOpenError for reset_timeout seconds, then one
+trial call is let through (half-open) and its outcome closes or reopens
+the circuit. A run against a dead endpoint stops after a few seconds
+instead of spending its remaining steps on timeouts.
+
+Usage:
+    policy, breaker = RetryPolicy(), CircuitBreaker()
+    text = policy.call(lambda attempt: breaker.call(request))
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+try:
+    from anthropic import APIConnectionError
+except ImportError:  # Only the grounding endpoint in use
+    APIConnectionError = ()
+
+# Statuses worth retrying; any other 4xx is the request's fault
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class CircuitOpenError(Exception):
+    """The endpoint failed repeatedly; calls are refused until reset_timeout passes."""
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of an API error (anthropic or requests), if it has one."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """Whether the error says the endpoint is down or overloaded."""
+    if isinstance(error, (APIConnectionError, OSError, asyncio.TimeoutError)):
+        return True
+    status = status_code(error)
+    return status is not None and status in RETRY_STATUSES
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Everything but a circuit refusal and a client error (4xx) may succeed on retry."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = status_code(error)
+    return status is None or status in RETRY_STATUSES
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait (retry-after-ms / Retry-After), if any."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP date
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter that honors Retry-After.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 20.0, max_retry_after: float = 60.0):
+        """
+        Args:
+            max_attempts: Attempts in total, the first one included
+            base_delay: Backoff ceiling before the first retry, doubled per retry
+            max_delay: Largest backoff ceiling
+            max_retry_after: Longest Retry-After honored; longer waits give up
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retries = 0
+
+    def delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        Seconds to sleep after a failed attempt (1-based), or None to give up.
+        """
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        asked = retry_after(error)
+        if asked is not None:
+            if asked > self.max_retry_after:
+                return None
+            return max(asked, backoff)
+        return backoff
+
+    def call(self, func: Callable[[int], Any], describe: str = "Attempt") -> Any:
+        """
+        Call func(attempt) until it succeeds or the policy gives up.
+
+        Raises:
+            The last error, once retries are exhausted or it isn't retryable
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(attempt)
+            except Exception as e:
+                wait = self.delay(attempt, e)
+                print(f"❌ {describe} {attempt}/{self.max_attempts} failed: {e}")
+                if wait is None:
+                    raise
+                print(f"   Retrying in {wait:.1f}s...")
+                self.retries += 1
+                time.sleep(wait)
+                attempt += 1
+
+    async def acall(self, func: Callable[[int], Awaitable[Any]], describe: str = "Attempt") -> Any:
+        """call() for coroutines; sleeps on the event loop."""
+        attempt = 1
+        while True:
+            try:
+                return await func(attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                wait = self.delay(attempt, e)
+                print(f"❌ {describe} {attempt}/{self.max_attempts} failed: {e}")
+                if wait is None:
+                    raise
+                print(f"   Retrying in {wait:.1f}s...")
+                self.retries += 1
+                await asyncio.sleep(wait)
+                attempt += 1
+
+
+class CircuitBreaker:
+    """
+    Fails fast once an endpoint has failed failure_threshold times in a row.
+    """
+
+    def __init__(self, name: str = "endpoint", failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Shown in CircuitOpenError messages
+            failure_threshold: Consecutive endpoint failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self.opened_at < self.reset_timeout else "half_open"
+
+    def before(self):
+        """Raise CircuitOpenError if calls are currently refused."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        if remaining > 0:
+            raise CircuitOpenError(f"{self.name} is unavailable after {self.failures} failures in a row; "
+                                   f"not retrying for {remaining:.0f}s")
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self, error: BaseException):
+        if not is_endpoint_failure(error):
+            return
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"   🔌 Circuit opened: {self.name} failed {self.failures} times in a row")
+                    self.trips += 1
+                # A failed half-open trial reopens for another reset_timeout
+                self.opened_at = time.monotonic()
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        self.before()
+        try:
+            result = func()
+        except Exception as e:
+            self.failure(e)
+            raise
+        self.success()
+        return result
+
+    async def acall(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.before()
+        try:
+            result = await func()
+        except Exception as e:
+            self.failure(e)
+            raise
+        self.success()
+        return result
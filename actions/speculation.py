@@ -0,0 +1,149 @@
+"""
+speculation.py - Ask for the next decision while the current action runs
+
+For actions whose outcome is predictable (wait, key presses, typing), the
+next model call doesn't have to wait for the action to finish. Speculator
+requests the next decision in a background thread against a predicted
+post-action frame: the pre-action frame for wait(), or a frame grabbed
+shortly after the action started otherwise. Once the action is done, the
+real post-action frame is compared with the predicted one; if they match
+within a threshold the speculative decision is used, otherwise discarded.
+
+Usage (StepAgent does this when speculate=True):
+    speculation = speculator.start(goal, action_dict)
+    result = agent.execute_action(action_dict)
+    next_action = speculator.resolve(speculation, result)  # None -> ask normally
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from frames import Frame
+from metrics import SpeculationStats
+
+# Actions whose post-action screen is usually predictable
+SPECULATIVE_ACTIONS = {"wait", "press_key", "hotkey", "type_text"}
+
+# wait() shouldn't change the screen; compare against the pre-action frame
+UNCHANGED_ACTIONS = {"wait"}
+
+
+class Speculation:
+    """One in-flight speculative decision."""
+
+    def __init__(self, action_dict: Dict[str, Any]):
+        self.action_dict = action_dict
+        self.frame: Optional[Frame] = None      # Predicted post-action frame
+        self.frame_ready = threading.Event()
+        self.requested_at: Optional[float] = None
+        self.answered_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+
+class Speculator:
+    """
+    Runs and checks speculative next_action calls for a StepAgent.
+    """
+
+    def __init__(self, agent, threshold: float = 0.002, early_delay: float = 0.2):
+        """
+        Args:
+            agent: The StepAgent to speculate for
+            threshold: Largest share of the screen (0-1) that may differ between
+                the predicted and the real post-action frame
+            early_delay: Seconds into a non-wait action to grab the predicted frame
+        """
+        self.agent = agent
+        self.threshold = threshold
+        self.early_delay = early_delay
+        self.stats = SpeculationStats()
+        # Missed speculations keep running to completion; two workers so one
+        # stale request never delays the next speculation
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculation")
+
+    def start(self, goal: str, action_dict: Dict[str, Any]) -> Optional[Speculation]:
+        """Start requesting the decision after action_dict, if it's predictable."""
+        if action_dict.get('action') not in SPECULATIVE_ACTIONS:
+            return None
+        if self.agent.conversation is not None:
+            # The speculative answer would be missing from the conversation
+            return None
+
+        speculation = Speculation(action_dict)
+        # Pre-action frame, taken before the action touches the screen
+        before = self.agent.frames.current()
+        # What the history will look like if the action succeeds; built now,
+        # before the action's real result gets appended
+        context = self.agent._history_context(pending={
+            "action": action_dict['action'],
+            "params": action_dict.get('params', {}),
+            "reasoning": action_dict.get('reasoning', ''),
+            "status": "success"
+        })
+        speculation.future = self._pool.submit(self._decide, speculation, goal, context, before)
+        return speculation
+
+    def _decide(self, speculation: Speculation, goal: str, context: str, before: Frame) -> Dict[str, Any]:
+        try:
+            if speculation.action_dict['action'] in UNCHANGED_ACTIONS:
+                frame = before
+            else:
+                time.sleep(self.early_delay)
+                frame = self.agent.frames.peek()
+            speculation.frame = frame
+        finally:
+            speculation.frame_ready.set()
+
+        messages = self.agent._step_messages(goal, (frame, self.agent._encode_frame(frame)), context=context)
+        speculation.requested_at = time.perf_counter()
+        # Same tier routing, escalation and request mode as a regular step
+        action_dict, _ = self.agent._tiered_decision(messages, frame)
+        speculation.answered_at = time.perf_counter()
+        return action_dict
+
+    def resolve(self, speculation: Optional[Speculation], result: Dict[str, Any],
+                actual: Optional[Frame] = None) -> Optional[Dict[str, Any]]:
+        """
+        Use or discard a speculation once its action has finished.
+
+        Args:
+            speculation: From start() (None is allowed and returns None)
+            result: execute_action() result for the speculated action
+            actual: The real post-action frame (captured if not given)
+
+        Returns:
+            The next action dict on a hit, None on a miss
+        """
+        if speculation is None:
+            return None
+        if result.get('status') != 'success':
+            self.stats.miss("action_failed")
+            return None
+
+        actual = actual or self.agent.frames.current()
+        speculation.frame_ready.wait()
+        if speculation.frame is None:
+            self.stats.miss("error")
+            return None
+
+        changed = actual.changed_fraction(speculation.frame)
+        if changed > self.threshold:
+            print(f"   🔮 Speculation discarded: {changed * 100:.2f}% of the screen differs")
+            self.stats.miss("screen_changed")
+            return None
+
+        resolved_at = time.perf_counter()
+        try:
+            action_dict = speculation.future.result()
+        except Exception as e:
+            print(f"   🔮 Speculative request failed: {e}")
+            self.stats.miss("error")
+            return None
+
+        # Model time that ran in parallel with the action instead of after it
+        saved = min(resolved_at, speculation.answered_at) - speculation.requested_at
+        self.stats.hit(saved)
+        print(f"   🔮 Speculation hit: next action ready, {saved:.2f}s of model time overlapped")
+        return action_dict
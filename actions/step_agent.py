@@ -10,14 +10,107 @@ Claude returns ONE next action (or "done")
 """
 
 import json
-import base64
-import io
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 from anthropic import Anthropic
 import pyautogui
 from actions import ComputerActions, get_action_descriptions
 from grounding import GroundingModel, SmartActions
+from frames import Frame, FramePipeline
+from encoding import EncodeResult, codec_stats
+from metrics import CacheStats, TierStats
+from json_stream import JSONObjectScanner
+from speculation import Speculator
+from hedging import Hedger
+from retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
+from decision_cache import DecisionCache
+from trajectory import Replay, TrajectoryStore
+from intents import run_intent
+from history import StepHistory
+from conversation import Conversation, image_block
+from tool_schema import CLICK_POSITION_TOOL, CONFIDENCE_PROPERTY, action_tools, validate_params
 import os
+import threading
+import time
+
+MODEL = "claude-sonnet-4-20250514"
+REQUEST_TIMEOUT = 60.0  # Seconds per model request
+
+STEP_INSTRUCTIONS = """You decide ONE action at a time.
+
+YOUR JOB:
+1. Look at the current screenshot
+2. Consider the goal and what's been done so far
+3. Decide the NEXT SINGLE ACTION to take
+4. Output ONLY that action in JSON format
+
+OUTPUT FORMAT:
+If you need to take another action:
+{
+  "action": "action_name",
+  "params": {"param1": "value1"},
+  "reasoning": "why this action"
+}
+
+If the goal is complete:
+{
+  "action": "done",
+  "params": {},
+  "reasoning": "goal accomplished"
+}
+
+RULES:
+- Output ONLY valid JSON, nothing else
+- ONE action per response
+- Use click_element() and type_in_element() when you need to find UI elements
+- Use wait() after actions that change the UI (1-3 seconds)
+- Be specific in element descriptions
+- Output "done" when goal is accomplished
+
+CRITICAL: Your entire response must be a single JSON object. No text before or after."""
+
+MACRO_INSTRUCTIONS = """BATCHING:
+When the next few actions don't depend on what the screen will show (for example
+open_app, wait, type_text, press_key), you may return them together:
+{
+  "actions": [
+    {"action": "open_app", "params": {"app_name": "Notes"}},
+    {"action": "wait", "params": {"seconds": 2}},
+    {"action": "checkpoint"},
+    {"action": "type_text", "params": {"text": "hello"}}
+  ],
+  "reasoning": "why these actions"
+}
+- Actions run in order without new screenshots
+- Put {"action": "checkpoint"} where you need to look at the screen again; you
+  will be asked for the next action there and anything after it is dropped
+- The batch also stops at the first action that fails
+- Only use a single action when unsure what the screen will look like"""
+
+TOOL_STEP_INSTRUCTIONS = """You decide ONE action at a time.
+
+YOUR JOB:
+1. Look at the current screenshot
+2. Consider the goal and what's been done so far
+3. Decide the NEXT SINGLE ACTION to take
+4. Call the tool for that action (call "done" when the goal is accomplished)
+
+RULES:
+- Call exactly ONE tool per response
+- Use click_element() and type_in_element() when you need to find UI elements
+- Use wait() after actions that change the UI (1-3 seconds)
+- Be specific in element descriptions"""
+
+CONFIDENCE_INSTRUCTIONS = """CONFIDENCE:
+Also include "confidence": a number from 0 to 1 for how sure you are that this
+is the right next action (0.9+ obvious, below 0.6 unsure)."""
+
+CLICK_INSTRUCTIONS = """Right now you are NOT choosing an action. You are helping place the mouse
+precisely on a UI element in the screenshot.
+
+- Coordinates are screenshot pixels, (0, 0) at the top left
+- Aim for the dead center of the element, not edges or corners
+- Answer with ONLY the JSON object the user asks for"""
+
 
 class StepAgent:
     """
@@ -27,12 +120,94 @@ class StepAgent:
     def __init__(
         self,
         anthropic_api_key: str,
-        grounding_model: Optional[GroundingModel] = None
+        grounding_model: Optional[GroundingModel] = None,
+        background_capture: bool = False,
+        roi: Optional[Union[str, Tuple[int, int, int, int]]] = None,
+        image_codec: str = "auto",
+        anthropic_base_url: Optional[str] = None,
+        streaming: bool = False,
+        frames: Optional[FramePipeline] = None,
+        speculate: bool = False,
+        history_token_budget: int = 1200,
+        history_recent_steps: int = 6,
+        conversation: bool = False,
+        macro_steps: bool = False,
+        tool_calls: bool = False,
+        model: str = MODEL,
+        fast_model: Optional[str] = None,
+        min_confidence: float = 0.6,
+        hedge: bool = False,
+        hedge_percentile: float = 0.9,
+        retry_policy: Optional[RetryPolicy] = None,
+        decision_cache: Optional[DecisionCache] = None,
+        trajectories: Optional[TrajectoryStore] = None
     ):
-        self.client = Anthropic(api_key=anthropic_api_key)
+        """
+        Args:
+            anthropic_api_key: Anthropic API key
+            grounding_model: Enables click_element/type_in_element when given
+            background_capture: Keep capturing frames in a background thread
+            roi: Capture only 'window' (active window), 'cursor' (box around the
+                cursor) or a (left, top, width, height) rectangle
+            image_codec: 'auto' (pick per frame: PNG/WebP for text, JPEG for photos) or 'jpeg'
+            anthropic_base_url: Messages API endpoint, e.g. a local stand-in
+                (see local_messages_api.py); defaults to $ANTHROPIC_BASE_URL or Anthropic
+            streaming: Stream next_action responses and act as soon as the JSON
+                decision closes, cancelling the rest of the response
+            frames: Frame pipeline to capture from (defaults to the grounding
+                model's, or a new full-screen one)
+            speculate: Request the next decision while predictable actions
+                (wait, keys, typing) run, and use it if the screen ends up as predicted
+            history_token_budget: Approximate token cap for the history in each prompt
+            history_recent_steps: Most recent steps shown verbatim; older ones are summarized
+            conversation: Keep one multi-turn conversation per run, with older
+                screenshots aged to thumbnails (see conversation.py)
+            macro_steps: Let the model return a batch of actions with checkpoints,
+                executed without a model call in between
+            tool_calls: Get decisions as schema-validated tool calls generated
+                from the action catalog instead of free-text JSON
+            model: Model for decisions (the strong tier when fast_model is set)
+            fast_model: Cheaper model for routine steps and click refinement;
+                decisions escalate to `model` on parse failures, repeated failed
+                actions, or self-reported confidence below min_confidence
+            min_confidence: Confidence under which a fast-tier decision escalates
+            hedge: Send a duplicate model request when one is slower than the
+                hedge_percentile of recent latencies; the first answer wins
+            hedge_percentile: Latency percentile (0-1) that triggers a hedge
+            retry_policy: Backoff for failed decision requests (default RetryPolicy());
+                a circuit breaker stops the run once the API keeps failing
+            decision_cache: Answer repeated decisions (same goal, recent steps and
+                near-identical screen) from this cache; not used in conversation mode
+            trajectories: Record completed runs here, and replay a goal's recorded
+                actions without the model while the screen matches the recording
+        """
+        # Retries are ours (RetryPolicy + CircuitBreaker), not the SDK's
+        self.client = Anthropic(api_key=anthropic_api_key, base_url=anthropic_base_url,
+                                max_retries=0, timeout=REQUEST_TIMEOUT)
         self.grounding = grounding_model
         self.actions = SmartActions(grounding_model) if grounding_model else ComputerActions()
         self.action_descriptions = get_action_descriptions()
+        self.image_codec = image_codec
+        self.streaming = streaming
+        self.macro_steps = macro_steps
+        self.model = model
+        self.fast_model = fast_model
+        self.min_confidence = min_confidence
+        self.tier_stats = TierStats()
+        if tool_calls and (conversation or macro_steps):
+            raise ValueError("tool_calls can't be combined with conversation or macro_steps")
+        self.decisions = 0  # Model decisions this run
+        self._decisions_lock = threading.Lock()  # Speculation counts from a worker thread
+        
+        # One capture per step, shared with the grounding model
+        self.frames = frames or (grounding_model.frames if grounding_model else FramePipeline())
+        if background_capture:
+            # Steps pick up an already-captured post-action frame
+            self.frames.start_background()
+        if isinstance(roi, tuple):
+            self.frames.set_roi('rect', rect=roi)
+        elif roi:
+            self.frames.set_roi(roi)
         
         # Add grounding actions if available
         if grounding_model:
@@ -49,109 +224,366 @@ class StepAgent:
                 }
             })
         
-        self.history = []  # List of executed actions
-    
-    def _screenshot_to_base64(self) -> str:
-        """Take screenshot and encode as base64, compressed to stay under 5MB."""
-        from PIL import Image
-        
-        screenshot = pyautogui.screenshot()
-        
-        # Convert RGBA to RGB (JPEG doesn't support transparency)
-        if screenshot.mode == 'RGBA':
-            rgb_screenshot = Image.new('RGB', screenshot.size, (255, 255, 255))
-            rgb_screenshot.paste(screenshot, mask=screenshot.split()[3])
-            screenshot = rgb_screenshot
+        # One tool per action, schemas from the action methods' signatures
+        self.tools = action_tools(self.actions, self.action_descriptions) if tool_calls else None
+        if self.tools and fast_model:
+            for tool in self.tools:
+                tool["input_schema"]["properties"]["confidence"] = CONFIDENCE_PROPERTY
         
-        # Resize if too large (keep aspect ratio)
-        max_dimension = 1920
-        if screenshot.width > max_dimension or screenshot.height > max_dimension:
-            screenshot.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        self.history = []  # List of executed actions
+        # What the prompt shows of it: recent steps verbatim, older ones summarized
+        self.step_history = StepHistory(token_budget=history_token_budget, recent_steps=history_recent_steps)
         
-        # Save as JPEG with compression
-        quality = 85
-        buffered = io.BytesIO()
-        screenshot.save(buffered, format="JPEG", quality=quality, optimize=True)
+        # Static prompt prefix: built once, cached provider-side across steps
+        self.system_prompt = self._build_system_prompt()
+        self.click_system_prompt = [self.system_prompt[0], {"type": "text", "text": CLICK_INSTRUCTIONS}]
+        self.cache_stats = CacheStats()
+        self.speculator = Speculator(self) if speculate else None
+        self.hedger = Hedger(percentile=hedge_percentile) if hedge else None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = CircuitBreaker("Anthropic API")
+        self.decision_cache = decision_cache
+        self.cached_decisions = 0  # Decisions answered by the decision cache this run
+        self._decision_key = None  # Cache key of the latest decision
+        self.trajectories = trajectories
+        self.conversation = Conversation() if conversation else None
+        self._replied_at = 0  # len(history) when the conversation last got a reply
+        self._last_observation = None  # (frame, encoding) of the latest decision request
+    
+    def _encode_frame(self, frame: Frame) -> EncodeResult:
+        """The encoding of frame that Claude gets (memoized on the frame)."""
+        if self.image_codec == "auto":
+            return frame.adaptive(frame.fit_size((1920, 1920)), "claude")
+        return frame.jpeg()
+    
+    def _screenshot(self, fresh: bool = True) -> Tuple[Frame, EncodeResult]:
+        """
+        Screenshot for Claude, sized to stay under the 5MB image limit.
         
-        # Check size and reduce quality if needed
-        while buffered.tell() > 4.5 * 1024 * 1024:  # 4.5MB to be safe
-            quality = max(60, quality - 10)
-            buffered = io.BytesIO()
-            screenshot.save(buffered, format="JPEG", quality=quality, optimize=True)
+        Args:
+            fresh: Capture a new frame (True) or reuse this step's frame (False)
+        """
+        frame = self.frames.capture() if fresh else self.frames.current()
+        encoded = self._encode_frame(frame)
+        if fresh:
+            print(f"📸 Screenshot: {encoded.size[0]}x{encoded.size[1]} {encoded.format} q={encoded.quality}, "
+                  f"{encoded.num_bytes / 1024:.0f}KB ({encoded.kind or 'fixed'} codec)")
+        return frame, encoded
+    
+    @staticmethod
+    def _image_block(encoded: EncodeResult) -> Dict[str, Any]:
+        return image_block(encoded)
+    
+    def _build_system_prompt(self) -> List[Dict[str, Any]]:
+        """
+        Build the system prompt blocks for step decisions.
         
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        The action catalog comes first and is shared with click refinement,
+        so one cached prefix serves both kinds of call.
+        """
+        if self.tools:
+            instructions = TOOL_STEP_INSTRUCTIONS
+        else:
+            instructions = STEP_INSTRUCTIONS + ("\n\n" + MACRO_INSTRUCTIONS if self.macro_steps else "")
+        if self.fast_model:
+            instructions += "\n\n" + CONFIDENCE_INSTRUCTIONS
+        return [self._catalog_block(), self._cached_text(instructions)]
     
-    def _build_system_prompt(self) -> str:
-        """Build the system prompt with available actions."""
+    def _catalog_block(self) -> Dict[str, Any]:
         actions_json = json.dumps(self.action_descriptions, indent=2)
-        
-        return f"""You are a computer automation agent that decides ONE action at a time.
+        return self._cached_text(f"""You are a computer automation agent that operates this desktop.
 
 AVAILABLE ACTIONS:
-{actions_json}
-
-YOUR JOB:
-1. Look at the current screenshot
-2. Consider the goal and what's been done so far
-3. Decide the NEXT SINGLE ACTION to take
-4. Output ONLY that action in JSON format
-
-OUTPUT FORMAT:
-If you need to take another action:
-{{
-  "action": "action_name",
-  "params": {{"param1": "value1"}},
-  "reasoning": "why this action"
-}}
-
-If the goal is complete:
-{{
-  "action": "done",
-  "params": {{}},
-  "reasoning": "goal accomplished"
-}}
-
-RULES:
-- Output ONLY valid JSON, nothing else
-- ONE action per response
-- Use click_element() and type_in_element() when you need to find UI elements
-- Use wait() after actions that change the UI (1-3 seconds)
-- Be specific in element descriptions
-- Output "done" when goal is accomplished
-
-CRITICAL: Your entire response must be a single JSON object. No text before or after."""
+{actions_json}""")
+    
+    @staticmethod
+    def _cached_text(text: str) -> Dict[str, Any]:
+        """A system text block marked as a prompt-cache breakpoint."""
+        return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
 
-    def next_action(self, goal: str) -> Dict[str, Any]:
+    def next_action(self, goal: str, observation: Optional[Tuple[Frame, EncodeResult]] = None) -> Dict[str, Any]:
         """
         Decide the next action to take.
         
         Args:
             goal: The overall goal to accomplish
+            observation: An already captured (frame, encoding) to decide on
             
         Returns:
             Action dictionary with 'action', 'params', 'reasoning'
         """
-        # Build context about what's been done
-        if self.history:
-            # Build a summary of completed actions
-            history_summary = "ACTIONS COMPLETED SO FAR:\n"
-            for i, h in enumerate(self.history, 1):
-                status_str = "✓" if h['status'] == 'success' else "✗"
-                history_summary += f"{i}. [{status_str}] {h['action']}({h.get('params', {})}) - {h.get('reasoning', '')}\n"
-            
-            history_summary += "\nDO NOT repeat these actions. Continue from where you left off.\n"
-            
-            last_action = self.history[-1]
-            context = f"\nLast action: {last_action['action']}({last_action['params']}) - {last_action['status']}\n"
-            context = history_summary + context
+        if self._uses_decision_cache():
+            frame = observation[0] if observation else self.frames.capture()
+            action_dict = self._cached_decision(goal, frame)
+            if action_dict is not None:
+                return action_dict
+            observation = observation or (frame, self._encode_frame(frame))
+        
+        messages = self._decision_messages(goal, observation)
+        
+        # Call Claude
+        print("🤔 Asking Claude for next action...")
+        action_dict, response_text = self._tiered_decision(messages, self._last_observation[0])
+        
+        self._record_reply(response_text)
+        self._cache_decision(action_dict)
+        return action_dict
+    
+    def _uses_decision_cache(self) -> bool:
+        # A cached answer would be missing from the conversation
+        return self.decision_cache is not None and self.conversation is None
+    
+    def _cached_decision(self, goal: str, frame: Frame) -> Optional[Dict[str, Any]]:
+        """Look the decision for frame up in the decision cache (remembers the key)."""
+        self._decision_key = self.decision_cache.key(frame, goal, self.history)
+        action_dict = self.decision_cache.get(self._decision_key)
+        if action_dict is not None:
+            self.cached_decisions += 1
+            print(f"🗃️  Decision cache hit: {action_dict.get('action', 'batch')}")
+        return action_dict
+    
+    def _cache_decision(self, action_dict: Dict[str, Any]):
+        if self._decision_key is not None:
+            self.decision_cache.put(self._decision_key, action_dict)
+    
+    def _count_decision(self):
+        with self._decisions_lock:
+            self.decisions += 1
+    
+    def _tiered_decision(self, messages: List[Dict[str, Any]], frame: Frame) -> Tuple[Dict[str, Any], str]:
+        """
+        One model decision, on the fast tier when routine and escalated to
+        the strong model when the fast answer can't be used.
+        
+        Returns:
+            (action_dict, response text to keep in the conversation)
+        """
+        self._count_decision()
+        tier = self._pick_tier()
+        try:
+            action_dict, response_text = self._decide(messages, frame, tier)
+            reason = self._escalation_reason(action_dict) if tier == "fast" else None
+        except (json.JSONDecodeError, ValueError):
+            if tier != "fast":
+                raise
+            reason = "parse_failure"
+        
+        if reason:
+            # Same messages, same encoded screenshot, stronger model
+            print(f"   ⬆️  Escalating to {self.model} ({reason})")
+            self.tier_stats.escalated(reason)
+            action_dict, response_text = self._decide(messages, frame, "strong")
+        return action_dict, response_text
+    
+    def _pick_tier(self) -> str:
+        """'fast' for routine steps, 'strong' when there's no fast model or things go wrong."""
+        if not self.fast_model:
+            return "strong"
+        self.tier_stats.routed()
+        recent = self.history[-2:]
+        if len(recent) == 2 and all(h['status'] not in ('success', 'complete') for h in recent):
+            self.tier_stats.escalated("repeated_failures")
+            return "strong"
+        return "fast"
+    
+    def _tier_model(self, tier: str) -> str:
+        return self.fast_model if tier == "fast" and self.fast_model else self.model
+    
+    def _escalation_reason(self, action_dict: Dict[str, Any]) -> Optional[str]:
+        confidence = action_dict.get('confidence')
+        if isinstance(confidence, (int, float)) and confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+    
+    def _decide(self, messages: List[Dict[str, Any]], frame: Frame, tier: str) -> Tuple[Dict[str, Any], str]:
+        """
+        One decision request on a tier.
+        
+        Returns:
+            (action_dict, response text to keep in the conversation)
+        """
+        model = self._tier_model(tier)
+        start = time.perf_counter()
+        try:
+            if self.tools:
+                action_dict = self._tool_decision(messages, frame, model=model)
+                return action_dict, json.dumps(action_dict)
+            response_text = self._request_decision(messages, model=model)
+            return self._parse_action(response_text, frame=frame), response_text
+        finally:
+            self.tier_stats.record(tier, time.perf_counter() - start)
+    
+    def _tool_decision(self, messages: List[Dict[str, Any]], frame: Frame, repairs: int = 1,
+                       model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the decision as a tool call and validate its params.
+        
+        Invalid params are sent back as a tool error in the same request
+        (same encoded screenshot, cached prefix) for the model to correct.
+        """
+        for attempt in range(repairs + 1):
+            response = self._create_message(**self._tool_request(messages, model))
+            self.cache_stats.record(getattr(response, 'usage', None))
+            action_dict, messages = self._read_tool_call(response, messages, frame, attempt == repairs)
+            if action_dict is not None:
+                return action_dict
+    
+    def _tool_request(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "model": model or self.model,
+            "max_tokens": 500,
+            "system": self.system_prompt,
+            "tools": self.tools,
+            "tool_choice": {"type": "any"},
+            "messages": messages
+        }
+    
+    def _read_tool_call(self, response: Any, messages: List[Dict[str, Any]], frame: Frame,
+                        last_attempt: bool) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Turn a tool-call response into an action dict.
+        
+        Returns:
+            (action_dict, messages); action_dict is None when the params were
+            invalid and messages now asks the model to correct them
+        """
+        call = next((b for b in response.content if b.type == "tool_use"), None)
+        if call is None:
+            raise ValueError("Response contained no tool call")
+        params = dict(call.input or {})
+        action_dict = {"action": call.name, "params": params, "reasoning": params.pop('reasoning', '')}
+        if 'confidence' in params:
+            action_dict['confidence'] = params.pop('confidence')
+        if call.name == "done":
+            return action_dict, messages
+        
+        try:
+            action_dict['params'] = validate_params(getattr(self.actions, call.name), params)
+        except (AttributeError, ValueError) as e:
+            if last_attempt:
+                raise
+            print(f"   ⚠️  Invalid tool call ({e}), asking for a correction")
+            return None, messages + [
+                {"role": "assistant", "content": [
+                    {"type": "tool_use", "id": call.id, "name": call.name, "input": call.input}
+                ]},
+                {"role": "user", "content": [
+                    {"type": "tool_result", "tool_use_id": call.id, "is_error": True, "content": str(e)}
+                ]}
+            ]
+        
+        self._map_coordinates(action_dict, frame)
+        return action_dict, messages
+    
+    def _request_decision(self, messages: List[Dict[str, Any]], max_tokens: int = 500,
+                          model: Optional[str] = None) -> str:
+        """Send a step decision request and return the response text."""
+        if self.streaming:
+            return self._stream_decision(messages, max_tokens, model)
+        
+        response = self._create_message(
+            model=model or self.model,
+            max_tokens=max_tokens,
+            system=self.system_prompt,
+            messages=messages
+        )
+        self.cache_stats.record(getattr(response, 'usage', None))
+        return response.content[0].text
+    
+    def _create_message(self, **request) -> Any:
+        """
+        messages.create behind the circuit breaker, hedged against slow
+        responses when hedging is on.
+        """
+        if self.hedger is None:
+            return self.breaker.call(lambda: self.client.messages.create(**request))
+        return self.breaker.call(lambda: self.hedger.call(lambda cancelled: self._hedged_message(request, cancelled)))
+    
+    def _hedged_message(self, request: Dict[str, Any], cancelled: threading.Event) -> Any:
+        """
+        One hedged attempt at messages.create, streamed so that an attempt
+        that lost can hang up at its next event instead of running to the end.
+        """
+        with self.client.messages.stream(**request) as stream:
+            for _ in stream:
+                if cancelled.is_set():
+                    # Leaving the block closes the connection; the winner's answer is used
+                    return None
+            return stream.get_final_message()
+    
+    def _history_context(self, pending: Optional[Dict[str, Any]] = None) -> str:
+        """
+        What's been done so far, for the step prompt.
+        
+        Only steps added since the last call are processed; older ones are
+        folded into a summary so the text stays within the token budget.
+        
+        Args:
+            pending: A step to show as already done (used by speculation)
+        """
+        self.step_history.sync(self.history)
+        return self.step_history.render(pending)
+    
+    def _decision_messages(self, goal: str,
+                           observation: Optional[Tuple[Frame, EncodeResult]] = None) -> List[Dict[str, Any]]:
+        """Messages for the next decision, single-turn or as the next conversation turn."""
+        frame, encoded = self._last_observation = observation or self._screenshot()
+        if self.conversation is None:
+            return self._step_messages(goal, (frame, encoded))
+        
+        if len(self.conversation) == 0:
+            # First turn: goal and instructions, same as a single-turn prompt
+            text = self._step_prompt(goal, self._history_context())
         else:
-            context = "No actions taken yet. This is the first action."
+            # Everything executed since the model last answered (several for a batch)
+            text = ""
+            for step in self.history[self._replied_at:]:
+                text += f"Executed: {step['action']}({step.get('params', {})}) - {step['status']}\n"
+                if step.get('error'):
+                    text += f"Error: {step['error']}\n"
+            text += ("\nThis is the screen now. What is the NEXT action? "
+                     "If the goal is complete, return {\"action\": \"done\"}")
+        return self.conversation.ask(text, frame, encoded)
+    
+    def _record_reply(self, response_text: str):
+        """Add the model's decision to the conversation (conversation mode only)."""
+        if self.conversation is not None:
+            self.conversation.reply(response_text.strip(), summarize=self._history_context)
+            self._replied_at = len(self.history)
+    
+    def _step_messages(self, goal: str, observation: Tuple[Frame, EncodeResult],
+                       context: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Messages for one step decision: goal, history and the screenshot.
         
-        # Take screenshot
-        screenshot_b64 = self._screenshot_to_base64()
+        Leaves _last_observation alone (the caller sets it), so speculation
+        can build messages from its worker thread.
         
-        # Build prompt
-        user_message = f"""Goal: {goal}
+        Args:
+            goal: The overall goal
+            observation: The captured (frame, encoding) to decide on
+            context: History text from _history_context() (built now if None)
+        """
+        # Build context about what's been done
+        if context is None:
+            context = self._history_context()
+        
+        frame, encoded = observation
+        
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self._step_prompt(goal, context)},
+                    self._image_block(encoded)
+                ]
+            }
+        ]
+    
+    @staticmethod
+    def _step_prompt(goal: str, context: str) -> str:
+        """The user text of a single-turn step decision."""
+        return f"""Goal: {goal}
 
 {context}
 
@@ -162,33 +594,53 @@ IMPORTANT:
 - Do NOT repeat actions that already succeeded
 - Continue from where you left off
 - If the goal is complete, return {{"action": "done"}}"""
+    
+    def _stream_decision(self, messages: List[Dict[str, Any]], max_tokens: int = 500,
+                         model: Optional[str] = None) -> str:
+        """
+        Stream a step decision and stop reading once the JSON object closes.
         
-        # Call Claude
-        print("🤔 Asking Claude for next action...")
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            system=self._build_system_prompt(),
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": user_message},
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": screenshot_b64
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
+        Returns:
+            The JSON object text, or the whole response if none was found
+        """
+        start = time.perf_counter()
         
-        # Parse response
-        response_text = response.content[0].text.strip()
+        def attempt(cancelled: Optional[threading.Event] = None) -> Tuple[JSONObjectScanner, List[str], Any]:
+            scanner = JSONObjectScanner()
+            chunks = []
+            with self.client.messages.stream(
+                model=model or self.model,
+                max_tokens=max_tokens,
+                system=self.system_prompt,
+                messages=messages
+            ) as stream:
+                for chunk in stream.text_stream:
+                    chunks.append(chunk)
+                    # A hedged attempt that lost: hang up
+                    if scanner.feed(chunk) is not None or (cancelled and cancelled.is_set()):
+                        break
+                # Usage arrives with message_start, so it's known even if we cut out early
+                usage = getattr(stream.current_message_snapshot, 'usage', None)
+            # Leaving the block closes the connection and cancels the rest of the response
+            return scanner, chunks, usage
+        
+        scanner, chunks, usage = self.breaker.call(lambda: self.hedger.call(attempt) if self.hedger else attempt())
+        # Only the attempt whose answer is used counts, not a hedged loser
+        self.cache_stats.record(usage)
+        if scanner.complete is not None:
+            print(f"   ⚡ Decision complete after {time.perf_counter() - start:.2f}s, stream cancelled")
+            return scanner.complete
+        return "".join(chunks)
+    
+    def _parse_action(self, response_text: str, frame: Optional[Frame] = None) -> Dict[str, Any]:
+        """
+        Extract the action JSON from a response and map its coordinates to the screen.
+        
+        Args:
+            response_text: Model output
+            frame: Frame the model was shown (defaults to the current one)
+        """
+        response_text = response_text.strip()
         
         # Try to extract JSON from response
         # Look for { ... } pattern
@@ -207,12 +659,61 @@ IMPORTANT:
         
         try:
             action_dict = json.loads(response_text)
+            for entry in action_dict.get('actions') or [action_dict]:
+                self._map_coordinates(entry, frame)
             return action_dict
         except json.JSONDecodeError as e:
             print(f"❌ Failed to parse: {e}")
             print(f"Response: {response_text}")
             raise
     
+    def _expand_batch(self, action_dict: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Split a decision into the action to run now and the rest of its batch.
+        
+        A batch ({"actions": [...]}) is cut at its first checkpoint; plain
+        single-action decisions come back unchanged with an empty rest.
+        """
+        if 'actions' not in action_dict:
+            return action_dict, []
+        
+        batch = []
+        for entry in action_dict.get('actions') or []:
+            if entry.get('action') == 'checkpoint':
+                if batch:
+                    break
+                continue
+            batch.append({
+                "action": entry['action'],
+                "params": entry.get('params', {}),
+                "reasoning": entry.get('reasoning') or action_dict.get('reasoning', '')
+            })
+        
+        if not batch:
+            return {"action": "wait", "params": {"seconds": 0.5}, "reasoning": "Empty action batch"}, []
+        if len(batch) > 1:
+            print(f"📦 Batch of {len(batch)} actions: {', '.join(a['action'] for a in batch)}")
+        return batch[0], batch[1:]
+    
+    def _map_coordinates(self, action_dict: Dict[str, Any], frame: Optional[Frame] = None):
+        """
+        Rewrite coordinate params from screenshot pixels to screen coordinates,
+        so handoffs carry points the grounding system can click directly.
+        """
+        params = action_dict.get('params') or {}
+        frame = frame or self.frames.current()
+        image_size = self._encode_frame(frame).size
+        
+        for x_key, y_key in (("x", "y"), ("from_x", "from_y"), ("to_x", "to_y")):
+            if isinstance(params.get(x_key), (int, float)) and isinstance(params.get(y_key), (int, float)):
+                params[x_key], params[y_key] = frame.to_screen(params[x_key], params[y_key], image_size)
+    
+    def _escalate_click(self, tier: str) -> str:
+        if tier == "fast":
+            print(f"   ⬆️  Escalating click refinement to {self.model}")
+            self.tier_stats.escalated("click_parse_failure", decision=False)
+        return "strong"
+    
     def _find_click_position(self, target_description: str, max_attempts: int = 5) -> tuple:
         """
         Iteratively find the right position to click using visual feedback.
@@ -226,13 +727,23 @@ IMPORTANT:
         """
         print(f"🎯 Finding position for: {target_description}")
         
+        # Cursor position in screen coordinates
         current_x, current_y = None, None
+        # Coordinate checks start on the fast tier; a parse failure moves them up
+        tier = "fast" if self.fast_model else "strong"
         
         for attempt in range(1, max_attempts + 1):
             print(f"   Attempt {attempt}/{max_attempts}...")
             
-            # Take screenshot
-            screenshot_b64 = self._screenshot_to_base64()
+            # Reuse the frame unless the cursor moved since it was taken
+            frame, encoded = self._screenshot(fresh=False)
+            image_size = encoded.size
+            
+            # Claude talks in screenshot pixels, which may be a scaled or cropped view
+            if current_x is not None:
+                cursor_x, cursor_y = frame.from_screen(current_x, current_y, image_size)
+            else:
+                cursor_x, cursor_y = None, None
             
             # Ask Claude for coordinates
             if attempt == 1:
@@ -249,7 +760,7 @@ Respond ONLY with JSON:
   "reasoning": "why these coordinates point to the center"
 }}"""
             else:
-                prompt = f"""The cursor is currently visible in the screenshot at position ({current_x}, {current_y}).
+                prompt = f"""The cursor is currently visible in the screenshot at position ({cursor_x}, {cursor_y}).
 
 Target: {target_description}
 
@@ -269,49 +780,59 @@ Respond ONLY with JSON:
 
 If the cursor is NOT on target, you MUST provide new x,y coordinates that differ by at least 10 pixels."""
             
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
+            tool_args = {}
+            if self.tools:
+                tool_args = {"tools": [CLICK_POSITION_TOOL],
+                             "tool_choice": {"type": "tool", "name": CLICK_POSITION_TOOL["name"]}}
+            start = time.perf_counter()
+            response = self._create_message(
+                model=self._tier_model(tier),
                 max_tokens=300,
+                system=self.click_system_prompt,
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/jpeg",
-                                    "data": screenshot_b64
-                                }
-                            }
+                            self._image_block(encoded)
                         ]
                     }
-                ]
+                ],
+                **tool_args
             )
+            self.tier_stats.record(tier, time.perf_counter() - start)
+            self.cache_stats.record(getattr(response, 'usage', None))
             
             # Parse response
-            response_text = response.content[0].text.strip()
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
-            
-            try:
-                result = json.loads(response_text)
-            except:
-                print(f"   ❌ Could not parse response")
-                continue
+            if self.tools:
+                result = next((dict(b.input) for b in response.content if b.type == "tool_use"), None)
+                if result is None or (attempt == 1 and result.get('x') is None):
+                    print(f"   ❌ No usable position in response")
+                    tier = self._escalate_click(tier)
+                    continue
+            else:
+                response_text = response.content[0].text.strip()
+                import re
+                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+                if json_match:
+                    response_text = json_match.group(0)
+                
+                try:
+                    result = json.loads(response_text)
+                except:
+                    print(f"   ❌ Could not parse response")
+                    tier = self._escalate_click(tier)
+                    continue
             
             # First attempt - just get coordinates
             if attempt == 1:
-                x, y = result['x'], result['y']
+                x, y = frame.to_screen(result['x'], result['y'], image_size)
                 current_x, current_y = x, y
                 print(f"   Initial guess: ({x}, {y}) - {result.get('reasoning', '')}")
                 
                 # Move cursor there
                 pyautogui.moveTo(x, y, duration=0.3)
-                import time
+                self.frames.invalidate()
                 time.sleep(0.5)
                 
             # Subsequent attempts - check if on target
@@ -321,22 +842,21 @@ If the cursor is NOT on target, you MUST provide new x,y coordinates that differ
                     return current_x, current_y
                 
                 if result.get('x') is not None and result.get('y') is not None:
-                    new_x, new_y = result['x'], result['y']
-                    
-                    # Enforce minimum movement of 10 pixels
-                    if current_x is not None and current_y is not None:
-                        distance = ((new_x - current_x)**2 + (new_y - current_y)**2)**0.5
+                    # Enforce minimum movement of 10 pixels (as Claude sees them)
+                    if cursor_x is not None and cursor_y is not None:
+                        distance = ((result['x'] - cursor_x)**2 + (result['y'] - cursor_y)**2)**0.5
                         
                         if distance < 10:
                             print(f"   ⚠️  Movement too small ({distance:.1f}px), encouraging larger adjustment...")
                             # Ask again with stronger language
                             continue
                     
+                    new_x, new_y = frame.to_screen(result['x'], result['y'], image_size)
                     current_x, current_y = new_x, new_y
                     print(f"   Adjusting to: ({new_x}, {new_y}) - {result.get('reasoning', '')}")
                     
                     pyautogui.moveTo(new_x, new_y, duration=0.3)
-                    import time
+                    self.frames.invalidate()
                     time.sleep(0.5)
                 else:
                     print(f"   ⚠️  No new coordinates provided")
@@ -394,8 +914,29 @@ If the cursor is NOT on target, you MUST provide new x,y coordinates that differ
             
             action_method = getattr(self.actions, action_name)
             
-            # Execute
-            result = action_method(**params)
+            # Bad params are the model's mistake, not a reason to hand off
+            try:
+                params = validate_params(action_method, params)
+            except ValueError as e:
+                print(f"   ❌ Invalid params: {e}")
+                return {
+                    "action": action_name,
+                    "params": params,
+                    "reasoning": reasoning,
+                    "error": str(e),
+                    "status": "failed"
+                }
+            
+            # Execute (grounded actions look at the frame this step decided on)
+            if isinstance(self.actions, SmartActions):
+                self.actions.frame = self.frames.current()
+            try:
+                result = action_method(**params)
+            finally:
+                # Whatever happened, the screen may have changed
+                if isinstance(self.actions, SmartActions):
+                    self.actions.frame = None
+                self.frames.invalidate()
             
             print(f"   ✅ Success")
             
@@ -421,13 +962,15 @@ If the cursor is NOT on target, you MUST provide new x,y coordinates that differ
                 "handoff_reason": "exception_during_execution"
             }
     
-    def run(self, goal: str, max_steps: int = 20) -> Dict[str, Any]:
+    def run(self, goal: str, max_steps: int = 20,
+            history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Run the agent step-by-step until done or handoff needed.
         
         Args:
             goal: Goal to accomplish
             max_steps: Maximum number of steps before stopping
+            history: Steps already taken toward the goal (e.g. by run_intent)
             
         Returns:
             Dictionary with status and history
@@ -436,101 +979,259 @@ If the cursor is NOT on target, you MUST provide new x,y coordinates that differ
         print(f"🎯 GOAL: {goal}")
         print("=" * 60)
         
-        self.history = []
+        self.history = list(history or [])
+        # Whatever the last run left cached is stale by now (replay checks step 1 against it)
+        self.frames.invalidate()
+        self.cache_stats.reset()
+        codec_stats.reset()
+        self.tier_stats.reset()
+        self.retry_policy.retries = 0
+        if self.hedger:
+            self.hedger.stats.reset()
+        if self.speculator:
+            self.speculator.stats.reset()
+        if self.conversation:
+            self.conversation.reset(goal)
+        self._replied_at = 0
+        self.decisions = 0
+        self.cached_decisions = 0
+        self._decision_key = None
         handoff_info = None
+        error = None
+        step = 0
+        speculated = None   # Next action from a speculation hit
+        observation = None  # Post-action frame already captured for the next step
+        queued = []         # Rest of the current action batch
+        # Recorded actions for this goal, replayed while the screen matches
+        replay = Replay(self.trajectories, self.trajectories.get(goal)) if self.trajectories is not None else None
+        if replay:
+            print(f"📼 Found a {len(replay.steps)}-step recording for this goal, replaying")
+        recording = []      # This run's trajectory, saved if it completes
         
         for step in range(1, max_steps + 1):
             print(f"\n{'='*60}")
             print(f"STEP {step}/{max_steps}")
             print(f"{'='*60}")
             
-            # Try to get next action with retries
-            max_retries = 3
-            action_dict = None
+            # Only a decision made (or looked up) in this step may be forgotten
+            self._decision_key = None
+            
+            # Get next action, with backoff between retries
+            action_dict, speculated = speculated, None
+            if action_dict is not None:
+                # A speculated decision can be a batch too (no queue is pending then)
+                action_dict, queued = self._expand_batch(action_dict)
+            if action_dict is None and queued:
+                action_dict = queued.pop(0)
+            if action_dict is None and replay:
+                action_dict = replay.next_action(self.frames)
             
-            for attempt in range(1, max_retries + 1):
+            if action_dict is None:
+                # Set once this step's frame is captured; until then a retry captures afresh
+                self._last_observation = None
                 try:
-                    action_dict = self.next_action(goal)
-                    break
+                    # A retry re-asks about the same, already encoded frame
+                    action_dict, queued = self._expand_batch(self.retry_policy.call(
+                        lambda attempt: self.next_action(goal, observation if attempt == 1 else self._last_observation)))
                 except Exception as e:
-                    print(f"❌ Attempt {attempt}/{max_retries} failed: {e}")
-                    if attempt < max_retries:
-                        print("   Retrying...")
-                        import time
-                        time.sleep(1)
-                    else:
-                        print("   Max retries reached, skipping this step")
-                        # Add a wait action as fallback
-                        action_dict = {
-                            "action": "wait",
-                            "params": {"seconds": 1.0},
-                            "reasoning": "Failed to get action from Claude, waiting"
-                        }
+                    action_dict, error = self._decision_failed(e)
+                    if action_dict is None:
+                        break
             
             if action_dict is None:
                 print("⚠️  Could not get action, stopping")
                 break
             
-            # Execute it
+            # Execute it (speculatively asking for the next step meanwhile,
+            # unless the batch or the recording already says what comes next)
+            speculation = (self.speculator.start(goal, action_dict)
+                           if self.speculator and not queued and not replay else None)
+            if self.trajectories is not None:
+                # Fingerprint of the screen the action was chosen for
+                recording.append({
+                    "action": action_dict['action'],
+                    "params": json.loads(json.dumps(action_dict.get('params') or {})),
+                    "reasoning": action_dict.get('reasoning', ''),
+                    "fingerprint": self.trajectories.fingerprint(self.frames.current())
+                })
             result = self.execute_action(action_dict)
             self.history.append(result)
+            if result['status'] not in ('success', 'complete'):
+                recording = recording[:-1]  # Replays only repeat what worked
+                if replay:
+                    replay.stop()
             
-            # Check if we need to handoff
-            if result['status'] == 'handoff':
-                handoff_info = {
-                    "action": result['action'],
-                    "params": result['params'],
-                    "reasoning": result['reasoning'],
-                    "goal": goal,
-                    "history": self.history
-                }
-                print("\n" + "=" * 60)
-                print("🔄 HANDOFF TO GROUNDING SYSTEM")
-                print("=" * 60)
-                print(f"Action needed: {result['action']}")
-                print(f"Description: {result['reasoning']}")
-                break
-            
-            # Check if done
-            if result['action'] == 'done':
-                print("\n" + "=" * 60)
-                print("✅ GOAL COMPLETE!")
-                print("=" * 60)
+            stop, handoff_info = self._check_result(result, goal)
+            if stop:
                 break
+            if result['status'] != 'success' and queued:
+                print(f"   ⚠️  Dropping {len(queued)} remaining batched actions")
+                queued = []
             
-            # Check if we should continue
-            if result['status'] == 'failed':
-                print(f"   ⚠️  Action failed, but continuing...")
+            observation = None
+            if speculation:
+                observation = self._screenshot()
+                speculated = self.speculator.resolve(speculation, result, observation[0])
         
-        if step >= max_steps:
+        if step >= max_steps and error is None:
             print("\n" + "=" * 60)
             print("⚠️  Reached max steps")
             print("=" * 60)
         
+        result = self._summarize(goal, handoff_info, error)
+        if replay is not None:
+            result["replayed"] = replay.replayed
+            result["replay_diverged_at"] = replay.diverged_at
+            if replay.replayed:
+                print(f"   Replayed: {replay.replayed} steps without the model"
+                      + (f", diverged at step {replay.diverged_at + 1}" if replay.diverged_at is not None else ""))
+        # A pure replay already matches what's stored
+        if self.trajectories is not None and result['status'] == 'complete' and (self.decisions or self.cached_decisions):
+            self.trajectories.record(goal, recording)
+        return result
+    
+    def _decision_failed(self, error: Exception) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        What to do once a decision failed for good.
+        
+        Returns:
+            (fallback action, None) to keep going, or (None, error message) to stop the run
+        """
+        if isinstance(error, CircuitOpenError) or not is_retryable(error) or self.breaker.failures:
+            # The API is down or refuses the request: more steps won't help
+            print(f"🛑 Stopping: {error}")
+            return None, str(error)
+        print("   Max retries reached, skipping this step")
+        # The model answered, just not usefully; give the screen a moment
+        return {
+            "action": "wait",
+            "params": {"seconds": 1.0},
+            "reasoning": "Failed to get action from Claude, waiting"
+        }, None
+    
+    def _check_result(self, result: Dict[str, Any], goal: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Decide whether a step result ends the run.
+        
+        Returns:
+            (stop, handoff_info)
+        """
+        # Check if we need to handoff
+        if result['status'] == 'handoff':
+            if result.get('handoff_reason') == 'exception_during_execution':
+                # The decision raised; don't hand it out again
+                self._forget_decision()
+            handoff_info = {
+                "action": result['action'],
+                "params": result['params'],
+                "reasoning": result['reasoning'],
+                "goal": goal,
+                "history": self.history
+            }
+            print("\n" + "=" * 60)
+            print("🔄 HANDOFF TO GROUNDING SYSTEM")
+            print("=" * 60)
+            print(f"Action needed: {result['action']}")
+            print(f"Description: {result['reasoning']}")
+            return True, handoff_info
+        
+        # Check if done
+        if result['action'] == 'done':
+            print("\n" + "=" * 60)
+            print("✅ GOAL COMPLETE!")
+            print("=" * 60)
+            return True, None
+        
+        # Check if we should continue
+        if result['status'] == 'failed':
+            print(f"   ⚠️  Action failed, but continuing...")
+            # Don't hand out this decision again
+            self._forget_decision()
+        return False, None
+    
+    def _forget_decision(self):
+        """Drop this step's decision from the decision cache, if it came from or went into it."""
+        if self._decision_key is not None:
+            self.decision_cache.forget(self._decision_key)
+            self._decision_key = None
+    
+    def _summarize(self, goal: str, handoff_info: Optional[Dict[str, Any]],
+                   error: Optional[str] = None) -> Dict[str, Any]:
+        """Print the run summary and build run()'s result."""
         # Summary
         print(f"\n📊 SUMMARY:")
         print(f"   Total steps: {len(self.history)}")
         successes = sum(1 for h in self.history if h['status'] == 'success')
         print(f"   Successful: {successes}/{len(self.history)}")
+        print(f"   Model decisions: {self.decisions}")
+        
+        decision_cache = self.decision_cache.stats.summary() if self.decision_cache is not None else None
+        if decision_cache:
+            print(f"   Decision cache: {self.cached_decisions} decisions from cache this run, "
+                  f"{decision_cache['hit_rate'] * 100:.0f}% hit rate overall")
         
         if handoff_info:
             print(f"   Status: HANDOFF")
+        if error:
+            print(f"   Status: ERROR ({error})")
+        if self.retry_policy.retries or self.breaker.trips:
+            print(f"   Retries: {self.retry_policy.retries}, circuit breaker trips: {self.breaker.trips}")
+        
+        codecs = codec_stats.summary()
+        if codecs:
+            print(f"   Image codecs: {codecs}")
+        
+        cache = self.cache_stats.summary()
+        if cache['requests']:
+            print(f"   Prompt cache: {cache['hits']}/{cache['requests']} hits, "
+                  f"{cache['cached_fraction'] * 100:.0f}% of input tokens read from cache")
+        
+        speculation = self.speculator.stats.summary() if self.speculator else None
+        if speculation and speculation['attempts']:
+            print(f"   Speculation: {speculation['hits']}/{speculation['attempts']} hits, "
+                  f"{speculation['saved_seconds']:.1f}s of model time overlapped with actions")
+        
+        tiers = self.tier_stats.summary() if self.fast_model else None
+        if tiers:
+            latency = ", ".join(f"{name} {t['requests']}x avg {t['avg_seconds']:.2f}s"
+                                for name, t in tiers['tiers'].items())
+            print(f"   Model tiers: {latency}; {tiers['escalation_rate'] * 100:.0f}% of decisions escalated")
+        
+        hedging = self.hedger.stats.summary() if self.hedger else None
+        if hedging and hedging['requests']:
+            print(f"   Hedging: {hedging['hedged']}/{hedging['requests']} requests hedged "
+                  f"({hedging['hedge_wins']} won by the hedge), p50 {hedging['p50_seconds']:.2f}s, "
+                  f"p99 {hedging['p99_seconds']:.2f}s")
         
         return {
-            "status": "handoff" if handoff_info else ("complete" if any(h['action'] == 'done' for h in self.history) else "incomplete"),
+            "status": "error" if error else "handoff" if handoff_info else ("complete" if any(h['action'] == 'done' for h in self.history) else "incomplete"),
             "goal": goal,
             "history": self.history,
-            "handoff": handoff_info
+            "handoff": handoff_info,
+            "decisions": self.decisions,
+            "cache": cache,
+            "speculation": speculation,
+            "tiers": tiers,
+            "hedging": hedging,
+            "retries": self.retry_policy.retries,
+            "cached_decisions": self.cached_decisions,
+            "decision_cache": decision_cache,
+            "error": error
         }
 
 
-def run_agent(instruction: str, anthropic_api_key: str = None) -> Dict[str, Any]:
+def run_agent(instruction: str, anthropic_api_key: str = None, plan: bool = False,
+              fast_path: bool = True) -> Dict[str, Any]:
     """
     Run the agent with a single instruction.
     
     Args:
         instruction: What the user wants to do
         anthropic_api_key: Anthropic API key (optional, will use env var if not provided)
+        plan: Plan the whole instruction in one call and verify locally
+            (PlanningAgent) instead of deciding step by step
+        fast_path: Run simple commands ("open chrome", "new tab", "scroll down")
+            straight from the local intent table, without a model call
         
     Returns:
         Result dictionary with status, history, and handoff info
@@ -540,6 +1241,15 @@ def run_agent(instruction: str, anthropic_api_key: str = None) -> Dict[str, Any]
         if result['status'] == 'handoff':
             print(f"Need to: {result['handoff']['action']}")
     """
+    # Simple commands don't need the model (or an API key)
+    history = None
+    if fast_path:
+        result = run_intent(instruction)
+        if result is not None and result['status'] == 'complete':
+            return result
+        # The model continues from what the fast path already did
+        history = result['history'] if result is not None else None
+    
     # Get API key
     if anthropic_api_key is None:
         anthropic_api_key = os.environ.get('ANTHROPIC_API_KEY')
@@ -547,13 +1257,18 @@ def run_agent(instruction: str, anthropic_api_key: str = None) -> Dict[str, Any]
             raise ValueError("ANTHROPIC_API_KEY required")
     
     # Create agent WITHOUT grounding model
-    agent = StepAgent(
+    if plan:
+        from planner import PlanningAgent  # planner imports this module
+        agent_class = PlanningAgent
+    else:
+        agent_class = StepAgent
+    agent = agent_class(
         anthropic_api_key=anthropic_api_key,
         grounding_model=None  # No grounding
     )
     
     # Run the instruction
-    result = agent.run(instruction, max_steps=15)
+    result = agent.run(instruction, max_steps=15, history=history)
     
     return result
 
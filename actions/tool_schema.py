@@ -0,0 +1,175 @@
+"""
+tool_schema.py - Action catalog as tool definitions, and param validation
+
+Builds one messages API tool per action, with an input schema derived from
+the action method's signature (types, required params) and the catalog's
+descriptions. With tool_choice "any" the model has to answer with exactly
+one well-formed tool call, so there is no free text to regex-parse.
+
+validate_params() checks a decision's params against the method signature
+before it runs, coercing harmless mismatches ("2" -> 2.0 for a float).
+
+Usage:
+    tools = action_tools(agent.actions, agent.action_descriptions)
+    params = validate_params(getattr(agent.actions, name), params)
+"""
+
+import copy
+import inspect
+import typing
+from typing import Any, Callable, Dict, List, Optional
+
+REASONING_PROPERTY = {"type": "string", "description": "Why this action, in one sentence"}
+CONFIDENCE_PROPERTY = {"type": "number", "description": "How sure you are this is the right action, 0 to 1"}
+
+DONE_TOOL = {
+    "name": "done",
+    "description": "The goal is accomplished; stop.",
+    "input_schema": {
+        "type": "object",
+        "properties": {"reasoning": REASONING_PROPERTY},
+        "required": ["reasoning"]
+    }
+}
+
+CLICK_POSITION_TOOL = {
+    "name": "report_position",
+    "description": "Report where the target element's center is in the screenshot.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "on_target": {"type": "boolean", "description": "Whether the visible cursor is already centered on the target"},
+            "x": {"type": ["integer", "null"], "description": "Target center X in screenshot pixels"},
+            "y": {"type": ["integer", "null"], "description": "Target center Y in screenshot pixels"},
+            "reasoning": REASONING_PROPERTY
+        },
+        "required": ["x", "y", "reasoning"]
+    }
+}
+
+
+def _json_schema(annotation: Any) -> Dict[str, Any]:
+    """JSON schema for a parameter annotation (unknown types allow anything)."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Union:
+        # Optional[X]
+        inner = [a for a in args if a is not type(None)]
+        return _json_schema(inner[0]) if len(inner) == 1 else {}
+    if origin is list:
+        return {"type": "array", "items": _json_schema(args[0]) if args else {}}
+    return {
+        str: {"type": "string"},
+        int: {"type": "integer"},
+        float: {"type": "number"},
+        bool: {"type": "boolean"},
+    }.get(annotation, {})
+
+
+def action_tool(name: str, method: Callable, description: Dict[str, Any]) -> Dict[str, Any]:
+    """Tool definition for one action method."""
+    properties, required = {}, []
+    param_docs = description.get('params', {})
+
+    for param in inspect.signature(method).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        schema = dict(_json_schema(param.annotation))
+        if param_docs.get(param.name):
+            schema["description"] = param_docs[param.name]
+        properties[param.name] = schema
+        if param.default is param.empty:
+            required.append(param.name)
+
+    properties["reasoning"] = REASONING_PROPERTY
+    text = description.get('description', name)
+    if description.get('example'):
+        text += f". Example: {description['example']}"
+    return {
+        "name": name,
+        "description": text,
+        "input_schema": {"type": "object", "properties": properties, "required": required + ["reasoning"]}
+    }
+
+
+def action_tools(actions: Any, descriptions: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One tool per catalog action that `actions` implements, plus "done".
+
+    The definitions are the caller's own copies, safe to modify.
+
+    Args:
+        actions: ComputerActions / SmartActions instance
+        descriptions: get_action_descriptions() (plus any additions)
+    """
+    tools = []
+    for name, description in descriptions.items():
+        method = getattr(actions, name, None)
+        if callable(method):
+            tools.append(action_tool(name, method, description))
+    tools.append(DONE_TOOL)
+    return copy.deepcopy(tools)
+
+
+def _coerce(value: Any, annotation: Any, name: str) -> Any:
+    schema = _json_schema(annotation)
+    kind = schema.get("type")
+    if value is None or not kind:
+        return value
+
+    if kind == "integer":
+        if isinstance(value, bool):
+            raise ValueError(f"'{name}' must be an integer, got {value!r}")
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+            return int(value)
+        if isinstance(value, int):
+            return value
+    elif kind == "number":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    elif kind == "string":
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+    elif kind == "boolean":
+        if isinstance(value, bool):
+            return value
+    elif kind == "array":
+        if isinstance(value, (list, tuple)):
+            args = typing.get_args(annotation)
+            return [_coerce(v, args[0], name) for v in value] if args else list(value)
+
+    raise ValueError(f"'{name}' must be {kind}, got {value!r}")
+
+
+def validate_params(method: Callable, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Check params against method's signature.
+
+    Returns:
+        The params, with values coerced to the annotated types
+
+    Raises:
+        ValueError: Unknown or missing params, or values of the wrong type
+    """
+    params = dict(params or {})
+    signature = inspect.signature(method)
+    try:
+        signature.bind(**params)
+    except TypeError as e:
+        raise ValueError(f"{method.__name__}: {e}")
+
+    for name, value in params.items():
+        param = signature.parameters.get(name)
+        if param is not None and param.annotation is not param.empty:
+            params[name] = _coerce(value, param.annotation, name)
+    return params
@@ -0,0 +1,158 @@
+"""
+trajectory.py - Record completed runs and replay them without the model
+
+When StepAgent.run completes a goal, the actions it took are recorded with
+a perceptual hash of the screen before each one. The next time the same
+(normalized) goal comes in, the run replays those actions directly: before
+each, the current screen's hash must be within max_distance bits of the
+recorded one (polling for up to verify_timeout while the UI settles).
+
+On the first mismatch or failed action, replay stops and the model takes
+over from there. The replayed steps are already in the run's history, so
+its prompt says what has been done. A run that completes after diverging
+records its new trajectory in place of the old one.
+
+Usage:
+    store = TrajectoryStore(path="~/.jarvis/trajectories.json")
+    agent = StepAgent(anthropic_api_key=key, trajectories=store)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from decision_cache import normalize_goal
+from frames import Frame
+
+
+class TrajectoryStore:
+    """
+    Recorded action sequences per goal, with a screen fingerprint per step.
+    """
+
+    def __init__(self, path: Optional[str] = None, hash_size: int = 16,
+                 max_distance: int = 12, verify_timeout: float = 3.0, max_goals: int = 200):
+        """
+        Args:
+            path: JSON file to persist trajectories in (None: memory only)
+            hash_size: Perceptual hash grid size (hash_size² bits)
+            max_distance: Differing hash bits that still count as the recorded screen
+            verify_timeout: Seconds to wait for the screen to match before diverging
+            max_goals: Goals kept; the least recently recorded go first
+        """
+        self.path = os.path.expanduser(path) if path else None
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.verify_timeout = verify_timeout
+        self.max_goals = max_goals
+        self._lock = threading.Lock()
+        self._goals: Dict[str, List[Dict[str, Any]]] = {}
+        if self.path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._goals)
+
+    def fingerprint(self, frame: Frame) -> str:
+        return format(frame.perceptual_hash(self.hash_size), "x")
+
+    def matches(self, frame: Frame, fingerprint: str) -> bool:
+        distance = bin(frame.perceptual_hash(self.hash_size) ^ int(fingerprint, 16)).count("1")
+        return distance <= self.max_distance
+
+    def get(self, goal: str) -> List[Dict[str, Any]]:
+        """Recorded steps for goal ('action', 'params', 'reasoning', 'fingerprint'), or []."""
+        with self._lock:
+            return [dict(step) for step in self._goals.get(normalize_goal(goal), [])]
+
+    def record(self, goal: str, steps: List[Dict[str, Any]]):
+        """Store steps as goal's trajectory, replacing any earlier one."""
+        key = normalize_goal(goal)
+        with self._lock:
+            self._goals.pop(key, None)
+            self._goals[key] = steps
+            while len(self._goals) > self.max_goals:
+                del self._goals[next(iter(self._goals))]
+        print(f"📼 Recorded {len(steps)}-step trajectory for '{key}'")
+        self.save()
+
+    def forget(self, goal: str):
+        with self._lock:
+            removed = self._goals.pop(normalize_goal(goal), None) is not None
+        if removed:
+            self.save()
+
+    # ==================== PERSISTENCE ====================
+
+    def load(self):
+        """Read trajectories from path (a missing or unreadable file means none)."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("hash_size") != self.hash_size:
+            return  # Fingerprints of another size can't be compared
+        with self._lock:
+            self._goals.update(data.get("goals", {}))
+        print(f"📼 {len(self._goals)} trajectories loaded from {self.path}")
+
+    def save(self):
+        """Write trajectories to path, atomically (no-op without a path)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"hash_size": self.hash_size, "goals": dict(self._goals)}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            json.dump(data, f)
+        os.replace(temp, self.path)
+
+
+class Replay:
+    """
+    The remaining steps of one run's trajectory replay.
+    """
+
+    def __init__(self, store: TrajectoryStore, steps: List[Dict[str, Any]]):
+        self.store = store
+        self.steps = steps
+        self.replayed = 0
+        self.diverged_at: Optional[int] = None  # Recorded step index where replay stopped
+
+    def __bool__(self) -> bool:
+        return bool(self.steps)
+
+    def next_action(self, frames) -> Optional[Dict[str, Any]]:
+        """
+        The next recorded action if the screen matches its fingerprint, else None
+        (and the replay is over).
+
+        Args:
+            frames: The agent's FramePipeline
+        """
+        step = self.steps[0]
+        deadline = time.monotonic() + self.store.verify_timeout
+        frame = frames.current()
+        while not self.store.matches(frame, step['fingerprint']):
+            if time.monotonic() >= deadline:
+                print(f"📼 Screen differs from the recording before step {self.replayed + 1}, "
+                      f"handing over to the model")
+                self.stop()
+                return None
+            time.sleep(0.25)
+            frame = frames.capture()
+
+        self.steps.pop(0)
+        self.replayed += 1
+        print(f"📼 Replaying step {self.replayed}: {step['action']}({step.get('params', {})})")
+        return {"action": step['action'], "params": step.get('params', {}), "reasoning": step.get('reasoning', '')}
+
+    def stop(self):
+        """Give up on the rest of the recording."""
+        if self.steps:
+            self.diverged_at = self.replayed
+            self.steps = []
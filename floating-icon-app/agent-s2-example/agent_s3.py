@@ -21,28 +21,77 @@ CONFIG = {
     "embedding_type": os.getenv("EMBEDDING_TYPE", "openai"),
     "max_steps": int(os.getenv("MAX_STEPS", "20")),
     "step_delay": float(os.getenv("STEP_DELAY", "0.5")),
-    "remote": os.getenv("USE_CLOUD_ENVIRONMENT", "false").lower() == "true"
+    "remote": os.getenv("USE_CLOUD_ENVIRONMENT", "false").lower() == "true",
+    # resize: LANCZOS to logical size | reduce: cheap integer box downscale | native: untouched
+    "screenshot_mode": os.getenv("SCREENSHOT_MODE", "resize").lower()
 }
 
 
+class ScaledPyAutoGUI:
+    """pyautogui stand-in that maps screenshot pixels to logical screen points (HiDPI)."""
+
+    # Function name -> index of the positional x argument
+    POINT_ARGS = {
+        "click": 0, "doubleClick": 0, "tripleClick": 0, "rightClick": 0, "middleClick": 0,
+        "moveTo": 0, "dragTo": 0, "mouseDown": 0, "mouseUp": 0,
+        "moveRel": 0, "move": 0, "dragRel": 0, "drag": 0,
+        "scroll": 1, "hscroll": 1, "vscroll": 1,
+    }
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def _unscale(self, v):
+        return round(v / self.scale) if isinstance(v, (int, float)) else v
+
+    def __getattr__(self, name):
+        attr = getattr(pyautogui, name)
+        if name not in self.POINT_ARGS:
+            return attr
+        i = self.POINT_ARGS[name]
+
+        def scaled(*args, **kwargs):
+            args = list(args)
+            if len(args) > i and isinstance(args[i], (tuple, list)):
+                args[i] = type(args[i])(self._unscale(v) for v in args[i])
+            else:
+                for j in (i, i + 1):
+                    if len(args) > j: args[j] = self._unscale(args[j])
+            for key in ("x", "y", "xOffset", "yOffset"):
+                if key in kwargs: kwargs[key] = self._unscale(kwargs[key])
+            return attr(*args, **kwargs)
+        return scaled
+
+
 class Executor:
-    def __init__(self, remote=False):
+    def __init__(self, remote=False, screenshot_mode=None):
         self.remote = remote
+        self.screenshot_mode = screenshot_mode or CONFIG["screenshot_mode"]
+        self.coord_scale = 1.0  # Screenshot pixels per logical screen point
         if remote:
             self.computer = Computer()
             self.platform = "linux"
         else:
             self.pyautogui = pyautogui
             self.platform = {"win32": "windows", "darwin": "darwin"}.get(sys.platform, "linux")
+            # Probe once so the grounding size is known before the first step
+            self.screenshot_size = self._prepare(self.pyautogui.screenshot()).size
     
-    def screenshot(self):
-        img = self.computer.screenshot() if self.remote else self.pyautogui.screenshot()
-        
-        if not self.remote:
-            screen_width, screen_height = self.pyautogui.size()
-            if img.size != (screen_width, screen_height):
-                # print(f"ℹ️  Resizing screenshot from {img.size} to {(screen_width, screen_height)}")
+    def _prepare(self, img):
+        """Bring a local HiDPI frame down to (or towards) logical size, per screenshot_mode."""
+        screen_width, screen_height = self.pyautogui.size()
+        if img.size != (screen_width, screen_height):
+            if self.screenshot_mode == "reduce":
+                if (factor := img.width // screen_width) > 1:
+                    img = img.reduce(factor)
+            elif self.screenshot_mode != "native":
                 img = img.resize((screen_width, screen_height), Image.Resampling.LANCZOS)
+        # Whatever scale is left over is undone on the coordinates in exec()
+        self.coord_scale = img.width / screen_width
+        return img
+    
+    def screenshot(self):
+        img = self.computer.screenshot() if self.remote else self._prepare(self.pyautogui.screenshot())
                 
         buffer = io.BytesIO()
         img.save(buffer, format="PNG")
@@ -57,14 +106,24 @@ class Executor:
             if output := result.get('output', '').strip():
                 print(f"📤 {output}")
         else:
-            exec(code, {"pyautogui": self.pyautogui, "time": time})
+            if self.coord_scale == 1:
+                exec(code, {"pyautogui": self.pyautogui, "time": time})
+                return
+            # Generated code starts with "import pyautogui", which would rebind the
+            # name to the real module; serve the wrapper from sys.modules meanwhile
+            gui = ScaledPyAutoGUI(self.coord_scale)
+            sys.modules["pyautogui"] = gui
+            try:
+                exec(code, {"pyautogui": gui, "time": time})
+            finally:
+                sys.modules["pyautogui"] = pyautogui
 
 
 def create_agent(executor):
     params = {"engine_type": CONFIG["model_type"], "model": CONFIG["model"]}
     
-    # Get screen size dynamically
-    screen_width, screen_height = pyautogui.size()
+    # Ground in the space of the screenshots we actually send
+    screen_width, screen_height = pyautogui.size() if executor.remote else executor.screenshot_size
     
     grounding = {
         "engine_type": CONFIG["grounding_type"], 
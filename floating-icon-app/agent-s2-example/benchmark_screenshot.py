@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark Executor.screenshot() per SCREENSHOT_MODE
+
+Usage: python benchmark_screenshot.py [steps]
+
+Compares the per-step cost of the LANCZOS resize path against the cheap
+integer reduce and the untouched native frame, including the PNG encode
+Agent-S gets. Most interesting on a Retina/HiDPI display.
+"""
+import io
+import os
+import statistics
+import sys
+import time
+
+import pyautogui
+from PIL import Image
+
+# Add current directory to path to import agent_s3
+sys.path.append(os.getcwd())
+
+from agent_s3 import Executor
+
+MODES = ["resize", "reduce", "native"]
+
+
+def bench(mode, steps):
+    executor = Executor(remote=False, screenshot_mode=mode)
+    executor.screenshot()  # Warm up
+
+    times, sizes = [], []
+    for _ in range(steps):
+        start = time.perf_counter()
+        png = executor.screenshot()
+        times.append(time.perf_counter() - start)
+        sizes.append(len(png))
+
+    img = Image.open(io.BytesIO(png))
+    return {
+        "mode": mode,
+        "size": img.size,
+        "scale": executor.coord_scale,
+        "mean": statistics.mean(times),
+        "p50": statistics.median(times),
+        "p95": sorted(times)[max(0, int(len(times) * 0.95) - 1)],
+        "kb": statistics.mean(sizes) / 1024,
+    }
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    width, height = pyautogui.size()
+    print(f"Logical Screen Size: {width}x{height}")
+    print(f"Native Screenshot Size: {pyautogui.screenshot().size}")
+    print(f"Steps per mode: {steps}\n")
+
+    results = [bench(mode, steps) for mode in MODES]
+
+    print(f"{'mode':<8} {'image':>11} {'scale':>6} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'PNG KB':>8}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['size'][0]:>5}x{r['size'][1]:<5} {r['scale']:>6.2f} "
+              f"{r['mean'] * 1000:>8.1f} {r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} {r['kb']:>8.0f}")
+
+    baseline = results[0]["mean"]
+    for r in results[1:]:
+        print(f"\n{r['mode']}: {(1 - r['mean'] / baseline) * 100:+.0f}% faster than resize per step")
+
+
+if __name__ == "__main__":
+    main()
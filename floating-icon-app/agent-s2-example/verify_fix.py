@@ -22,11 +22,15 @@ def test_screenshot_resizing():
     img = Image.open(io.BytesIO(screenshot_bytes))
     print(f"Executor Screenshot Size: {img.width}x{img.height}")
     
-    if img.width == screen_width and img.height == screen_height:
-        print("✅ SUCCESS: Screenshot matches logical screen size.")
+    print(f"Screenshot mode: {executor.screenshot_mode} (coordinate scale {executor.coord_scale:.2f})")
+    
+    # Non-resize modes keep extra pixels and undo the scale on coordinates instead
+    expected = (round(screen_width * executor.coord_scale), round(screen_height * executor.coord_scale))
+    if (img.width, img.height) == expected:
+        print("✅ SUCCESS: Screenshot matches logical screen size times the coordinate scale.")
     else:
         print("❌ FAILURE: Screenshot size mismatch.")
-        print(f"Expected: {screen_width}x{screen_height}")
+        print(f"Expected: {expected[0]}x{expected[1]}")
         print(f"Actual: {img.width}x{img.height}")
 
 if __name__ == "__main__":
@@ -7,9 +7,13 @@ import io
 import requests
 import re
 import os
-import base64
+import sys
 import time
 
+# Streaming request body helper lives with the other agent modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actions'))
+from request_body import IMAGE_PLACEHOLDER, StreamingJSONBody
+
 # Your endpoint
 ENDPOINT_URL = "https://k0mkv3j05m8vnmea.us-east-1.aws.endpoints.huggingface.cloud"
 
@@ -31,9 +35,6 @@ def find_element(query, screenshot_bytes):
     """
     print(f"Looking for: {query}")
     
-    # Convert screenshot to base64
-    screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
-    
     # Prepare the prompt
     prompt = f"Query:{query}\nOutput only the coordinate of one point in your response.\n"
     
@@ -57,7 +58,8 @@ def find_element(query, screenshot_bytes):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{screenshot_b64}"
+                            # base64-encoded on the fly while the request is sent
+                            "url": IMAGE_PLACEHOLDER
                         }
                     }
                 ]
@@ -74,7 +76,7 @@ def find_element(query, screenshot_bytes):
         response = requests.post(
             url,
             headers=headers,
-            json=payload,
+            data=StreamingJSONBody(payload, screenshot_bytes, "image/png"),
             timeout=60
         )
         